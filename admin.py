@@ -0,0 +1,201 @@
+"""
+Команды администратора: бан-лист по страницам, выгрузка бан-листа в CSV, рассылка и метрики.
+
+Бан-лист читается страницами по индексу (database.get_blocked_page), поэтому и первая,
+и тысячная страница стоят одинаково, а сообщение не выходит за лимит Telegram в 4096
+символов. Выгрузка идёт тем же запросом порциями, рассылка — через broadcast() с тем же
+ограничителем частоты (broadcast.send_limiter), что и доставка еженедельных уведомлений.
+"""
+import asyncio
+import csv
+import io
+import logging
+from datetime import datetime
+from aiogram import Bot, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import BufferedInputFile, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from config import ADMIN_ID, ADMIN_PAGE_SIZE, METRICS_ENABLED
+from database import count_blocked, get_blocked_page, iter_blocked_users, iter_users, is_blocked, mark_blocked
+from broadcast import broadcast, send_limiter
+from utils import format_birthdate
+import fileio
+import metrics
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Идущая рассылка администратора; одновременно — только одна
+_broadcast_task = None
+
+
+# Разделитель «|», потому что во времени блокировки есть «:»
+class BanListPage(CallbackData, prefix="bans", sep="|"):
+    # Последняя запись предыдущей страницы; "" и 0 — первая страница
+    after_at: str = ""
+    after: int = 0
+
+
+async def _check_admin(message: Message) -> bool:
+    if message.from_user.id != ADMIN_ID:
+        await message.answer("У вас нет доступа к этой команде.")
+        return False
+    return True
+
+
+def _format_blocked(user) -> str:
+    if user.name is None:
+        # Если данные пользователя не найдены в базе
+        return (
+            f"🆔 ID: {user.user_id}\n"
+            f"⏰ Дата блокировки: {user.blocked_at}\n"
+            f"⚠️ Данные пользователя не найдены в базе."
+        )
+    birthdate = format_birthdate(user.birth_ordinal) if user.birth_ordinal is not None else "—"
+    return (
+        f"👤 Имя: {user.name}\n"
+        f"📅 Дата рождения: {birthdate}\n"
+        f"🆔 ID: {user.user_id}\n"
+        f"👤 Логин: @{user.username}\n"
+        f"⏰ Дата блокировки: {user.blocked_at}"
+    )
+
+
+async def _ban_list_page(after_at: str, after: int):
+    """Текст и клавиатура страницы бан-листа; (None, None), если список пуст."""
+    # Лишняя запись — признак следующей страницы
+    page = await get_blocked_page(after_at, after, ADMIN_PAGE_SIZE + 1)
+    if not page:
+        return None, None
+    has_next = len(page) > ADMIN_PAGE_SIZE
+    page = page[:ADMIN_PAGE_SIZE]
+
+    total = await count_blocked()
+    text = f"Заблокировавшие бота пользователи ({total}):\n\n" + "\n\n".join(_format_blocked(user) for user in page)
+    buttons = []
+    if after:
+        buttons.append(InlineKeyboardButton(text="⏮ В начало", callback_data=BanListPage().pack()))
+    if has_next:
+        next_page = BanListPage(after_at=page[-1].blocked_at, after=page[-1].user_id)
+        buttons.append(InlineKeyboardButton(text="Дальше ▶️", callback_data=next_page.pack()))
+    return text, InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+# Обработчик команды /бан-лист
+@router.message(Command("бан-лист"))
+async def handle_ban_list(message: Message):
+    if not await _check_admin(message):
+        return
+    try:
+        text, keyboard = await _ban_list_page("", 0)
+        if text is None:
+            await message.answer("Нет пользователей, заблокировавших бота.")
+            return
+        await message.answer(text, reply_markup=keyboard)
+    except Exception as e:
+        logger.error(f"Ошибка при обработке команды /бан-лист: {e}")
+        await message.answer("Произошла ошибка при получении списка заблокированных пользователей.")
+
+
+# Переход по страницам бан-листа
+@router.callback_query(BanListPage.filter())
+async def handle_ban_list_page(callback: CallbackQuery, callback_data: BanListPage):
+    if callback.from_user.id != ADMIN_ID:
+        await callback.answer("У вас нет доступа к этой команде.")
+        return
+    try:
+        text, keyboard = await _ban_list_page(callback_data.after_at, callback_data.after)
+        if text is None:
+            await callback.message.edit_text("Нет пользователей, заблокировавших бота.")
+        else:
+            await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Например, «message is not modified» при повторном нажатии той же кнопки
+        logger.warning(f"Не удалось показать страницу бан-листа: {e}")
+    except Exception as e:
+        logger.error(f"Ошибка при переходе по страницам бан-листа: {e}")
+    finally:
+        # Без ответа у администратора так и крутится индикатор загрузки на кнопке
+        await callback.answer()
+
+
+def _blocked_csv(users) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["user_id", "blocked_at", "name", "birthdate", "username"])
+    for user in users:
+        birthdate = format_birthdate(user.birth_ordinal) if user.birth_ordinal is not None else ""
+        writer.writerow([user.user_id, user.blocked_at, user.name or "", birthdate, user.username or ""])
+    # utf-8-sig — чтобы Excel сразу открыл файл с кириллицей
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+# Обработчик команды /бан-лист-csv: весь бан-лист файлом
+@router.message(Command("бан-лист-csv"))
+async def handle_ban_list_csv(message: Message):
+    if not await _check_admin(message):
+        return
+    try:
+        users = [user async for user in iter_blocked_users()]
+        if not users:
+            await message.answer("Нет пользователей, заблокировавших бота.")
+            return
+        # Сборка CSV на сотни тысяч строк заняла бы цикл событий, поэтому идёт в пуле потоков
+        document = BufferedInputFile(
+            await fileio.run(_blocked_csv, users), filename=f"blocked_{datetime.now():%Y%m%d_%H%M%S}.csv"
+        )
+        await message.answer_document(document, caption=f"Заблокировавших бота: {len(users)}")
+    except Exception as e:
+        logger.error(f"Ошибка при выгрузке бан-листа: {e}")
+        await message.answer("Произошла ошибка при выгрузке списка заблокированных пользователей.")
+
+
+async def _run_broadcast(bot: Bot, admin_chat_id: int, text: str):
+    async def messages():
+        async for user in iter_users():
+            if not is_blocked(user.user_id):
+                yield user.user_id, text
+
+    async def on_blocked(user_id):
+        if await mark_blocked(user_id):
+            logger.warning(f"Пользователь {user_id} заблокировал бота. Добавлен в список заблокированных.")
+
+    try:
+        stats = await broadcast(bot, messages(), limiter=send_limiter, on_blocked=on_blocked)
+        await bot.send_message(admin_chat_id, f"Рассылка завершена: {stats.summary()}")
+    except Exception as e:
+        logger.error(f"Ошибка при рассылке администратора: {e}")
+        await bot.send_message(admin_chat_id, "Рассылка прервана из-за ошибки.")
+
+
+# Обработчик команды /рассылка <текст>
+@router.message(Command("рассылка"))
+async def handle_broadcast(message: Message, command: CommandObject, bot: Bot):
+    global _broadcast_task
+    if not await _check_admin(message):
+        return
+    if not command.args:
+        await message.answer("Напишите текст после команды: /рассылка Текст сообщения")
+        return
+    if _broadcast_task is not None and not _broadcast_task.done():
+        await message.answer("Предыдущая рассылка ещё не закончилась.")
+        return
+    # Рассылка идёт в фоне, чтобы не задерживать обработку других обновлений
+    _broadcast_task = asyncio.create_task(_run_broadcast(bot, message.chat.id, command.args))
+    await message.answer("Рассылка запущена. Сообщу, когда закончится.")
+
+
+# Обработчик команды /метрики
+@router.message(Command("метрики"))
+async def handle_metrics(message: Message):
+    if not await _check_admin(message):
+        return
+    if not METRICS_ENABLED:
+        await message.answer("Метрики выключены (METRICS_ENABLED=0).")
+        return
+    text = await metrics.render()
+    # Ограничение Telegram — 4096 символов в сообщении
+    for start in range(0, len(text), 4000):
+        await message.answer(text[start:start + 4000])
@@ -0,0 +1,46 @@
+"""
+Стоимость расчёта прожитых недель на одного пользователя: строковая дата против номера дня.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_birthdate [число_пользователей]
+"""
+import random
+import sys
+import time
+from datetime import date, datetime
+
+
+def old_weeks(birthdate_db: str, now: datetime) -> int:
+    # Как было: get_user переводил YYYY-MM-DD в DD.MM.YYYY, а обработчик разбирал строку снова
+    birthdate_user_format = datetime.strptime(birthdate_db, "%Y-%m-%d").strftime("%d.%m.%Y")
+    birthdate_dt = datetime.strptime(birthdate_user_format, "%d.%m.%Y")
+    return (now - birthdate_dt).days // 7
+
+
+def new_weeks(birth_ordinal: int, today_ordinal: int) -> int:
+    return (today_ordinal - birth_ordinal) // 7
+
+
+def run(users: int):
+    start, end = date(1930, 1, 1).toordinal(), date(2020, 1, 1).toordinal()
+    ordinals = [random.randint(start, end) for _ in range(users)]
+    strings = [date.fromordinal(o).isoformat() for o in ordinals]
+    now = datetime.now()
+    today = now.date().toordinal()
+
+    started = time.perf_counter()
+    old = [old_weeks(s, now) for s in strings]
+    old_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    new = [new_weeks(o, today) for o in ordinals]
+    new_elapsed = time.perf_counter() - started
+
+    assert old == new
+    print(f"Строка и strptime: {old_elapsed / users * 1e9:.0f} нс на пользователя ({old_elapsed:.3f} с всего)")
+    print(f"Номер дня:         {new_elapsed / users * 1e9:.0f} нс на пользователя ({new_elapsed:.3f} с всего)")
+    print(f"Ускорение: в {old_elapsed / new_elapsed:.0f} раз")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,46 @@
+"""
+Замер движка рассылки на поддельном Bot API.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_broadcast [число_пользователей]
+"""
+import asyncio
+import sys
+from broadcast import broadcast
+from benchmarks.fake_bot import make_fake_bot
+
+
+async def run(users: int):
+    blocked_ids = set(range(0, users, 50))  # Каждый 50-й пользователь заблокировал бота
+    bot = make_fake_bot(latency=0.05, flood_rate=0.002, blocked_ids=blocked_ids, retry_after=1)
+    session = bot.session
+
+    sent, blocked = [], []
+
+    async def on_sent(chat_id):
+        sent.append(chat_id)
+
+    async def on_blocked(chat_id):
+        blocked.append(chat_id)
+
+    messages = ((user_id, f"Тест {user_id}") for user_id in range(users))
+    stats = await broadcast(bot, messages, rate=1000, on_sent=on_sent, on_blocked=on_blocked)
+
+    print(f"Пользователей: {users}")
+    print(f"Итог: {stats.summary()}")
+    print(f"Одновременных запросов (максимум): {session.max_in_flight}")
+    assert stats.sent == len(sent) and stats.blocked == len(blocked) == len(blocked_ids)
+    assert stats.sent + stats.blocked + stats.failed == users
+
+    # Последовательная отправка для сравнения (как было раньше)
+    sample = min(users, 100)
+    bot = make_fake_bot(latency=0.05)
+    started = asyncio.get_running_loop().time()
+    for user_id in range(sample):
+        await bot.send_message(user_id, f"Тест {user_id}")
+    elapsed = asyncio.get_running_loop().time() - started
+    print(f"Последовательно: {sample / elapsed:.1f} сообщ./с")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
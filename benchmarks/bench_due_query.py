@@ -0,0 +1,68 @@
+"""
+Проверка и замер выборки пользователей для рассылки.
+
+Скрипт заполняет временную базу, убеждается через EXPLAIN QUERY PLAN, что выборка
+идёт по покрывающему индексу idx_users_due, и сравнивает её с полным перебором таблицы.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_due_query [число_пользователей]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "users.db")
+
+import database  # noqa: E402  DB_PATH должен быть задан до импорта
+from utils import next_notify_at  # noqa: E402
+
+
+async def seed(users: int):
+    await database.init_db()
+    db = await database.get_db_connection()
+    start, end = date(1940, 1, 1).toordinal(), date(2015, 1, 1).toordinal()
+    rows = []
+    for user_id in range(1, users + 1):
+        birth_ordinal = random.randint(start, end)
+        rows.append((user_id, f"user{user_id}", date.fromordinal(birth_ordinal).isoformat(), birth_ordinal,
+                     next_notify_at(birth_ordinal)))
+    await db.executemany(
+        "INSERT INTO users (user_id, name, birthdate, birth_ordinal, next_notify_at) VALUES (?, ?, ?, ?, ?)", rows
+    )
+    await db.execute("ANALYZE")
+    await db.commit()
+
+
+async def check_plan():
+    async with database.read_connection() as db:
+        cursor = await db.execute("EXPLAIN QUERY PLAN " + database.SELECT_DUE_USERS, (0, 1, 0, 1))
+        plan = " ".join(row[-1] for row in await cursor.fetchall())
+    print(f"План запроса: {plan}")
+    assert "USING COVERING INDEX idx_users_due" in plan, "выборка не использует покрывающий индекс"
+
+
+async def run(users: int):
+    await seed(users)
+    await check_plan()
+
+    now_ts = await database.get_next_notify_at()  # Момент, когда уведомление получит первая группа
+    started = time.perf_counter()
+    due = await database.get_due_users(now_ts, users)
+    indexed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scanned = [user async for user in database.iter_users()]
+    full_scan = time.perf_counter() - started
+
+    print(f"Пользователей: {users}, к отправке: {len(due)}")
+    print(f"Выборка по индексу: {indexed * 1000:.1f} мс")
+    print(f"Перебор всей таблицы: {full_scan * 1000:.1f} мс ({len(scanned)} строк)")
+    await database.close_db_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,272 @@
+"""
+Нагрузочный замер бота на поддельном сервере Bot API (benchmarks/fake_api.py).
+
+Для каждого размера базы отдельный процесс заполняет временный users.db и гоняет
+настоящий код бота: dp из bot.py, планировщик (scheduler.process_due) и доставку
+из очереди (outbox.deliver_batch). Бот ходит к поддельному API по HTTP, а тот отвечает
+с задержкой, иногда 429 и всегда 403 для каждого --blocked-every пользователя.
+
+Замеряется:
+- регистрация новых пользователей (/start, имя, дата рождения) — регистраций в секунду;
+- кнопка «📊 Статус» — задержка от получения обновления до ответа, p50 и p99;
+- еженедельная рассылка, когда пора уведомить всю базу: постановка в очередь и доставка
+  первых --send-limit уведомлений (для остальных выводится оценка по скорости доставки);
+- наибольшая задержка цикла событий на каждом этапе (loop_monitor.LoopLagMonitor);
+- пиковое потребление памяти процессом бота (ru_maxrss).
+
+Лимиты рассылки подняты (BROADCAST_RATE, BROADCAST_WORKERS), чтобы упираться в код бота,
+а не в ограничения Telegram; их можно задать через переменные окружения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_load [--sizes 10000,100000,1000000]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, datetime
+
+FAKE_TOKEN = "123456:" + "A" * 35
+
+
+def child_env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env.update(DB_PATH=db_path, BOT_TOKEN=FAKE_TOKEN, ADMIN_ID="0", LOG_LEVEL="ERROR")
+    env.setdefault("BROADCAST_RATE", "100000")
+    env.setdefault("BROADCAST_WORKERS", "256")
+    return env
+
+
+async def seed(users: int, now_ts: int):
+    """Заполняет базу пользователями, которым всем пора отправить уведомление."""
+    import database
+    db = await database.get_db_connection()
+    start, end = date(1940, 1, 1).toordinal(), date(2015, 1, 1).toordinal()
+    for first in range(1, users + 1, 100000):
+        rows = []
+        for user_id in range(first, min(users, first + 99999) + 1):
+            birth_ordinal = random.randint(start, end)
+            rows.append((user_id, f"user{user_id}", f"user{user_id}", date.fromordinal(birth_ordinal).isoformat(),
+                         birth_ordinal, now_ts - 1))
+        await db.executemany(
+            "INSERT INTO users (user_id, name, username, birthdate, last_notified_week, birth_ordinal, next_notify_at) "
+            "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+            rows,
+        )
+    await db.execute("ANALYZE")
+    await db.commit()
+
+
+def make_update(update_id: int, user_id: int, text: str):
+    from aiogram.types import Chat, Message, Update, User
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name=f"user{user_id}"),
+        text=text,
+    )
+    return Update(update_id=update_id, message=message)
+
+
+async def run_concurrently(items, worker, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(item):
+        async with semaphore:
+            await worker(item)
+
+    await asyncio.gather(*(run_one(item) for item in items))
+
+
+async def run_child(args) -> dict:
+    # Модули бота читают настройки при импорте, а их задаёт родительский процесс
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    import bot as bot_module
+    import database
+    from config import OUTBOX_BATCH_SIZE
+    from loop_monitor import LoopLagMonitor
+    from outbox import deliver_batch
+    from scheduler import process_due
+
+    logging.basicConfig(level=os.environ["LOG_LEVEL"])
+    users = args.child
+    result = {"users": users}
+    await database.init_db()
+
+    now_ts = int(time.time())
+    started = time.perf_counter()
+    await seed(users, now_ts)
+    result["seed_s"] = time.perf_counter() - started
+
+    bot = Bot(FAKE_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(args.api), limit=args.concurrency))
+    # Как в bot.main(): объекты, созданные при запуске, не участвуют в сборке мусора
+    gc.collect()
+    gc.freeze()
+    dp = bot_module.dp
+    monitor = LoopLagMonitor(interval=0.01, warn=float("inf"))
+    monitor_task = asyncio.create_task(monitor.run())
+    lag = result["loop_lag_ms"] = {}
+    update_ids = iter(range(1, 10 ** 9))
+    errors = 0
+
+    async def feed(user_id, text):
+        nonlocal errors
+        try:
+            await dp.feed_update(bot, make_update(next(update_ids), user_id, text))
+        except Exception:
+            errors += 1  # 429 от поддельного API доходит до обработчика, как и от настоящего
+
+    def is_blocked_id(user_id):
+        return args.blocked_every and user_id % args.blocked_every == 0
+
+    # Регистрация: новые пользователи проходят /start, имя и дату рождения
+    new_ids = [user_id for user_id in range(users + 1, users + args.onboard * 2) if not is_blocked_id(user_id)]
+    new_ids = new_ids[:args.onboard]
+
+    async def register(user_id):
+        for text in ("/start", f"Пользователь {user_id}", "15.06.1990"):
+            await feed(user_id, text)
+
+    monitor.reset()
+    started = time.perf_counter()
+    await run_concurrently(new_ids, register, args.concurrency)
+    await database.flush_writes()
+    elapsed = time.perf_counter() - started
+    async with database.read_connection() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM users WHERE user_id > ?", (users,))
+        registered = (await cursor.fetchone())[0]
+    result["onboard_per_s"] = registered / elapsed
+    result["onboard_registered"] = registered
+    lag["onboard"] = monitor.reset() * 1000
+
+    # Статус: случайные зарегистрированные пользователи нажимают кнопку
+    status_ids = [user_id for user_id in random.sample(range(1, users + 1), min(users, args.status * 2))
+                  if not is_blocked_id(user_id)][:args.status]
+    latencies = []
+
+    async def status(user_id):
+        started = time.perf_counter()
+        await feed(user_id, "📊 Статус")
+        latencies.append(time.perf_counter() - started)
+
+    await run_concurrently(status_ids, status, args.concurrency)
+    quantiles = statistics.quantiles(latencies, n=100)
+    result["status_p50_ms"] = quantiles[49] * 1000
+    result["status_p99_ms"] = quantiles[98] * 1000
+    result["handler_errors"] = errors
+    lag["status"] = monitor.reset() * 1000
+
+    # Еженедельная рассылка: вся база стала «должна получить уведомление» одновременно
+    started = time.perf_counter()
+    planned = 0
+    while True:
+        count = await process_due(now_ts)
+        if not count:
+            break
+        planned += count
+    await database.flush_writes()
+    result["planned"] = planned
+    result["plan_s"] = time.perf_counter() - started
+    lag["plan"] = monitor.reset() * 1000
+
+    started = time.perf_counter()
+    delivered = 0
+    while delivered < args.send_limit:
+        batch = await database.claim_outbox(time.time(), min(OUTBOX_BATCH_SIZE, args.send_limit - delivered), "bench")
+        if not batch:
+            break
+        await deliver_batch(bot, batch)
+        delivered += len(batch)
+    deliver_s = time.perf_counter() - started
+    result["delivered"] = delivered
+    result["deliver_per_s"] = delivered / deliver_s if deliver_s else 0.0
+    result["deliver_full_s"] = planned / result["deliver_per_s"] if result["deliver_per_s"] else 0.0
+    result["outbox"] = await database.get_outbox_depth()
+    lag["deliver"] = monitor.reset() * 1000
+    monitor_task.cancel()
+
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    await bot.session.close()
+    await database.close_db_connection()
+    return result
+
+
+def start_fake_api(args):
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_api", "--port", str(args.port),
+        "--latency", str(args.latency), "--flood-rate", str(args.flood_rate),
+        "--blocked-every", str(args.blocked_every),
+    ])
+    url = f"http://127.0.0.1:{args.port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{url}/stats", timeout=1)
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Поддельный Bot API не запустился")
+
+
+def print_result(result: dict):
+    print(f"\nПользователей: {result['users']} (заполнение базы {result['seed_s']:.1f} с)")
+    print(f"  Регистрация: {result['onboard_per_s']:.0f} в секунду ({result['onboard_registered']} пользователей)")
+    print(f"  Статус: p50 {result['status_p50_ms']:.1f} мс, p99 {result['status_p99_ms']:.1f} мс")
+    print(f"  Ошибок в обработчиках (429 от API): {result['handler_errors']}")
+    print(f"  Рассылка: в очередь {result['planned']} за {result['plan_s']:.1f} с; "
+          f"доставлено {result['delivered']} по {result['deliver_per_s']:.0f} в секунду, "
+          f"вся очередь ≈ {result['deliver_full_s']:.0f} с; очередь после: {result['outbox']}")
+    print("  Наибольшая задержка цикла событий: " + ", ".join(
+        f"{phase} {ms:.0f} мс" for phase, ms in result["loop_lag_ms"].items()
+    ))
+    print(f"  Пиковая память процесса бота: {result['peak_rss_mb']:.0f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="размеры базы через запятую")
+    parser.add_argument("--onboard", type=int, default=2000, help="сколько новых пользователей регистрировать")
+    parser.add_argument("--status", type=int, default=5000, help="сколько раз нажать «Статус»")
+    parser.add_argument("--send-limit", type=int, default=50000, help="сколько уведомлений доставить")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременных пользователей")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка поддельного API, сек")
+    parser.add_argument("--flood-rate", type=float, default=0.0001, help="доля ответов 429")
+    parser.add_argument("--blocked-every", type=int, default=100, help="каждый такой пользователь заблокировал бота")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--api", help=argparse.SUPPRESS)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_child(args)), ensure_ascii=False))
+        return
+
+    api, url = start_fake_api(args)
+    try:
+        for size in (int(size) for size in args.sizes.split(",")):
+            with tempfile.TemporaryDirectory() as tmp:
+                child = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_load", *sys.argv[1:], "--child", str(size), "--api", url],
+                    env=child_env(os.path.join(tmp, "users.db")), stdout=subprocess.PIPE, text=True, check=True,
+                )
+            print_result(json.loads(child.stdout.strip().splitlines()[-1]))
+    finally:
+        api.terminate()
+        api.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Планирование еженедельной рассылки: расчёт через datetime на каждого пользователя против plan_week.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_planner [число_пользователей]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, datetime
+
+os.environ.setdefault("ADMIN_ID", "0")
+
+from database import UserRecord  # noqa: E402
+from planner import plan_week  # noqa: E402
+
+
+def old_plan(rows, blocked):
+    # Как было: строковая дата разбиралась и текущее время бралось заново для каждого пользователя
+    due = []
+    for user_id, name, birthdate, last_week, username in rows:
+        if user_id in blocked:
+            continue
+        birthdate_dt = datetime.strptime(birthdate, "%Y-%m-%d")
+        weeks_lived = (datetime.now().date() - birthdate_dt.date()).days // 7
+        if last_week is None or weeks_lived > last_week:
+            due.append((user_id, weeks_lived))
+    return due
+
+
+def make_users(count: int, today: int):
+    start, end = date(1930, 1, 1).toordinal(), date(2020, 1, 1).toordinal()
+    users = []
+    for user_id in range(1, count + 1):
+        birth_ordinal = random.randint(start, end)
+        weeks = (today - birth_ordinal) // 7
+        # Часть уже получила уведомление за эту неделю, у части его ещё не было
+        last_week = random.choice((weeks, weeks - 1, weeks - 1, None))
+        users.append(UserRecord(user_id, f"user{user_id}", birth_ordinal, last_week, None))
+    return users
+
+
+def run(count: int):
+    today = date.today().toordinal()
+    users = make_users(count, today)
+    rows = [(u.user_id, u.name, date.fromordinal(u.birth_ordinal).isoformat(), u.last_notified_week, u.username)
+            for u in users]
+    blocked = set(random.sample(range(1, count + 1), count // 100))
+
+    started = time.perf_counter()
+    old = old_plan(rows, blocked)
+    old_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    plan = plan_week(users, today, blocked)
+    new_elapsed = time.perf_counter() - started
+
+    assert [(d.user.user_id, d.weeks_lived) for d in plan] == old
+    print(f"Пользователей: {count}, к отправке: {len(plan)}, круглых дат: {sum(d.milestone for d in plan)}")
+    print(f"datetime на каждого: {old_elapsed * 1000:.0f} мс")
+    print(f"plan_week:           {new_elapsed * 1000:.0f} мс")
+    print(f"Ускорение: в {old_elapsed / new_elapsed:.0f} раз")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
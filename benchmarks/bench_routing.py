@@ -0,0 +1,80 @@
+"""
+Стоимость маршрутизации одного обновления: цепочка lambda-фильтров против MessageRouter.
+
+Через настоящий Dispatcher прогоняются синтетические Update с нажатием последней
+зарегистрированной кнопки (худший случай для цепочки фильтров) при разном числе кнопок.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_routing [число_обновлений]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+from aiogram import Dispatcher
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Update
+from benchmarks.fake_bot import make_fake_bot
+from routing import MessageRouter
+
+
+class Registration(StatesGroup):
+    name = State()
+    birthdate = State()
+
+
+async def noop(message):
+    pass
+
+
+def lambda_dispatcher(buttons):
+    dp = Dispatcher()
+    # Так были устроены обработчики в bot.py: каждый фильтр проверяется по очереди
+    waiting_for_name, waiting_for_birthdate = {}, {}
+    dp.message.register(noop, lambda message: message.from_user.id in waiting_for_name)
+    dp.message.register(noop, lambda message: message.from_user.id in waiting_for_birthdate)
+    for text in buttons:
+        dp.message.register(noop, lambda message, text=text: message.text == text)
+    return dp
+
+
+def router_dispatcher(buttons):
+    dp = Dispatcher()
+    router = MessageRouter()
+    dp.message.register(router.handle, router.match)
+    router.state(Registration.name)(noop)
+    router.state(Registration.birthdate)(noop)
+    for text in buttons:
+        router.button(text)(noop)
+    return dp
+
+
+def make_update(bot, update_id, text):
+    return Update.model_validate({"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(datetime.now().timestamp()),
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": False, "first_name": "Тест"},
+        "text": text,
+    }}, context={"bot": bot})
+
+
+async def measure(dp, bot, text, count):
+    updates = [make_update(bot, i, text) for i in range(count)]
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def run(count: int):
+    bot = make_fake_bot(latency=0)
+    print(f"{'кнопок':>8} {'lambda, мкс':>12} {'router, мкс':>12}")
+    for size in (3, 30, 300):
+        buttons = [f"Кнопка {i}" for i in range(size)]
+        chain = await measure(lambda_dispatcher(buttons), bot, buttons[-1], count)
+        routed = await measure(router_dispatcher(buttons), bot, buttons[-1], count)
+        print(f"{size:>8} {chain:>12.1f} {routed:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
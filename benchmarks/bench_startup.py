@@ -0,0 +1,83 @@
+"""
+Время холодного запуска: импорт bot.py (по python -X importtime) и подготовка базы.
+
+Каждый замер — отдельный процесс, как при перезапуске. Выводится медиана полного импорта,
+доля aiogram и самые дорогие собственные модули бота, а затем время init_db на пустой базе
+(создание схемы и все миграции) и на уже готовой (обычный перезапуск).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup [число_запусков]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+FAKE_TOKEN = "123456:" + "A" * 35
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OWN_MODULES = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+INIT_DB = """
+import asyncio, time
+import database
+started = time.perf_counter()
+async def main():
+    await database.init_db()
+    await database.close_db_connection()
+asyncio.run(main())
+print(time.perf_counter() - started)
+"""
+
+
+def env(db_path: str) -> dict:
+    result = dict(os.environ)
+    result.update(DB_PATH=db_path, BOT_TOKEN=FAKE_TOKEN, ADMIN_ID="0")
+    return result
+
+
+def import_times(db_path: str) -> dict:
+    """Собственное и общее время импорта модулей в микросекундах: {модуль: (self, cumulative)}."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot"],
+        cwd=ROOT, env=env(db_path), stderr=subprocess.PIPE, text=True, check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def init_db_time(db_path: str) -> float:
+    process = subprocess.run(
+        [sys.executable, "-c", INIT_DB], cwd=ROOT, env=env(db_path), stdout=subprocess.PIPE, text=True, check=True,
+    )
+    return float(process.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        samples = [import_times(db_path) for _ in range(runs)]
+
+        total = statistics.median(times["bot"][1] for times in samples) / 1000
+        aiogram = statistics.median(times["aiogram"][1] for times in samples) / 1000
+        own = {name: statistics.median(times[name][0] for times in samples) / 1000
+               for name in OWN_MODULES if name in samples[0]}
+        print(f"Импорт bot.py: {total:.0f} мс, из них aiogram {aiogram:.0f} мс, "
+              f"собственные модули {sum(own.values()):.1f} мс")
+        for name, ms in sorted(own.items(), key=lambda item: -item[1])[:10]:
+            print(f"  {name}: {ms:.1f} мс")
+        heavy = [name for name in ("aiohttp.web", "webhook") if name in samples[0]]
+        print(f"Необязательные подсистемы в импорте: {', '.join(heavy) or 'нет'}")
+
+        fresh = init_db_time(db_path)
+        ready = statistics.median(init_db_time(db_path) for _ in range(runs))
+        print(f"init_db на пустой базе: {fresh * 1000:.0f} мс, на готовой: {ready * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
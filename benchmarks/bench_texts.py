@@ -0,0 +1,67 @@
+"""
+Склонение слова «неделя»: прежние get_weeks_text/number_to_text против таблицы из texts.py.
+
+Сначала проверяется, что для всех чисел из большого диапазона (включая отрицательные)
+и всех сочетаний падежа и use_text результат совпадает с прежним, затем замеряется скорость.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_texts [число_вызовов]
+"""
+import random
+import sys
+import time
+
+import texts
+
+
+def old_number_to_text(number: int, case: str = "именительный") -> str:
+    number_words = {
+        1: {"именительный": "одна", "винительный": "одну"},
+        2: {"именительный": "две", "винительный": "две"},
+        3: {"именительный": "три", "винительный": "три"},
+        4: {"именительный": "четыре", "винительный": "четыре"},
+        5: {"именительный": "пять", "винительный": "пять"},
+        6: {"именительный": "шесть", "винительный": "шесть"},
+        7: {"именительный": "семь", "винительный": "семь"},
+        8: {"именительный": "восемь", "винительный": "восемь"},
+        9: {"именительный": "девять", "винительный": "девять"}
+    }
+    return number_words.get(number, {}).get(case, str(number))
+
+
+def old_get_weeks_text(weeks: int, case: str = "именительный", use_text: bool = False) -> str:
+    if use_text and 1 <= weeks <= 9:
+        weeks_word = old_number_to_text(weeks, case)
+    else:
+        weeks_word = str(weeks)
+
+    if weeks % 10 == 1 and weeks % 100 != 11:
+        return f"{weeks_word} неделя" if case == "именительный" else f"{weeks_word} неделю"
+    elif 2 <= weeks % 10 <= 4 and (weeks % 100 < 12 or weeks % 100 > 14):
+        return f"{weeks_word} недели" if case == "именительный" else f"{weeks_word} недели"
+    else:
+        return f"{weeks_word} недель"
+
+
+def check():
+    numbers = list(range(-2000, 20000)) + random.sample(range(20000, 10 ** 9), 100000)
+    for case in (texts.NOMINATIVE, texts.ACCUSATIVE):
+        for use_text in (False, True):
+            for n in numbers:
+                assert texts.weeks_text(n, case, use_text) == old_get_weeks_text(n, case, use_text), (n, case, use_text)
+    print(f"Совпадает с прежним склонением на {len(numbers) * 4} вариантах")
+
+
+def run(calls: int):
+    check()
+    numbers = [random.randint(0, 6000) for _ in range(calls)]
+    for name, weeks_text in (("Прежняя функция", old_get_weeks_text), ("Таблица форм", texts.weeks_text)):
+        started = time.perf_counter()
+        for n in numbers:
+            weeks_text(n, texts.ACCUSATIVE, True)
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {elapsed / calls * 1e9:.0f} нс на вызов")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
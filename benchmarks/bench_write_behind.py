@@ -0,0 +1,66 @@
+"""
+Сравнение записи новых пользователей: коммит на каждую регистрацию против буфера отложенной записи.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_write_behind [число_пользователей]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "users.db")
+
+import database  # noqa: E402  DB_PATH должен быть задан до импорта
+from utils import next_notify_at  # noqa: E402
+
+BIRTH_DATE = date(2000, 1, 1)
+
+
+async def per_row_commits(users: int):
+    birth_ordinal = BIRTH_DATE.toordinal()
+    for user_id in range(users):
+        async with database.write_transaction() as db:
+            await db.execute(database.INSERT_USER, (
+                user_id, f"user{user_id}", birth_ordinal, None, next_notify_at(birth_ordinal), BIRTH_DATE.isoformat(),
+            ))
+    return users  # Один коммит на пользователя
+
+
+async def write_behind(users: int):
+    commits = 0
+    db = await database.get_db_connection()
+    original_commit = db.commit
+
+    async def counting_commit():
+        nonlocal commits
+        commits += 1
+        await original_commit()
+
+    db.commit = counting_commit
+    for user_id in range(users, users * 2):
+        await database.add_user(user_id, f"user{user_id}", BIRTH_DATE, None)
+    await database.flush_writes()
+    db.commit = original_commit
+    return commits
+
+
+async def run(users: int):
+    try:
+        await database.init_db()
+        for title, bench in (("Коммит на каждую запись", per_row_commits), ("Буфер отложенной записи", write_behind)):
+            started = time.perf_counter()
+            commits = await bench(users)
+            elapsed = time.perf_counter() - started
+            print(f"{title}: {users} регистраций за {elapsed:.3f} с, "
+                  f"{users / elapsed:.0f} регистраций/с, коммитов: {commits} ({commits / elapsed:.0f} в секунду)")
+    finally:
+        # Незакрытое соединение aiosqlite не даёт процессу завершиться
+        await database.close_db_connection()
+    print(f"Временная база: {os.environ['DB_PATH']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
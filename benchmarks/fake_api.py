@@ -0,0 +1,84 @@
+"""
+Поддельный сервер Bot API для нагрузочных замеров.
+
+В отличие от FakeSession из fake_bot.py, это настоящий HTTP-сервер: бот ходит к нему
+через обычную AiohttpSession aiogram, поэтому в замер попадают сериализация запросов,
+пул соединений и разбор ответов. Каждый ответ приходит с задержкой, часть запросов
+получает 429 (flood), а запросы к «заблокировавшим» пользователям — 403.
+
+Запуск отдельным процессом из корня репозитория:
+    python -m benchmarks.fake_api --port 8081 --latency 0.02 --flood-rate 0.0001 --blocked-every 100
+
+Бот подключается так:
+    Bot(token, session=AiohttpSession(api=TelegramAPIServer.from_base("http://127.0.0.1:8081")))
+"""
+import argparse
+import asyncio
+import random
+import time
+from aiohttp import web
+
+
+def make_app(latency: float = 0.02, flood_rate: float = 0.0, retry_after: int = 1, blocked_every: int = 0):
+    """blocked_every — каждый такой chat_id считается заблокировавшим бота (0 — никто)."""
+    stats = {"requests": 0, "flood": 0, "blocked": 0}
+
+    async def handle(request):
+        method = request.match_info["method"]
+        form = await request.post()
+        stats["requests"] += 1
+        await asyncio.sleep(latency)
+
+        if flood_rate and random.random() < flood_rate:
+            stats["flood"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }, status=429)
+
+        chat_id = int(form["chat_id"]) if "chat_id" in form else None
+        if chat_id is not None and blocked_every and chat_id % blocked_every == 0:
+            stats["blocked"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user",
+            }, status=403)
+
+        if method.lower() == "sendmessage":
+            result = {
+                "message_id": stats["requests"],
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": form.get("text", ""),
+            }
+        elif method.lower() == "getchat":
+            result = {"id": chat_id, "type": "private"}
+        elif method.lower() == "getme":
+            result = {"id": 123456, "is_bot": True, "first_name": "Fake"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    app.router.add_get("/stats", handle_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа, сек")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля запросов с ответом 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429, сек")
+    parser.add_argument("--blocked-every", type=int, default=0, help="каждый такой chat_id получает 403")
+    args = parser.parse_args()
+    app = make_app(args.latency, args.flood_rate, args.retry_after, args.blocked_every)
+    web.run_app(app, host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Поддельный Bot API для проверки рассылок без сети.
+
+FakeSession подменяет HTTP-сессию aiogram: каждый запрос «выполняется» с задержкой,
+а часть запросов завершается flood-ошибкой (429) или блокировкой (403).
+"""
+import asyncio
+import random
+from datetime import datetime
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message
+
+FAKE_TOKEN = "123456:" + "A" * 35
+
+
+class FakeSession(BaseSession):
+    def __init__(self, latency: float = 0.05, flood_rate: float = 0.0, blocked_ids=(), retry_after: int = 1,
+                 max_rate: float = None):
+        super().__init__()
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.blocked_ids = set(blocked_ids)
+        self.retry_after = retry_after
+        self.max_rate = max_rate  # Сколько запросов в секунду «сервер» готов принять
+        self.requests = []  # (время, метод, chat_id)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        now = asyncio.get_running_loop().time()
+        chat_id = getattr(method, "chat_id", None)
+        self.requests.append((now, type(method).__name__, chat_id))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.max_rate is not None:
+                recent = sum(1 for t, _, _ in self.requests if now - t < 1)
+                if recent > self.max_rate:
+                    raise TelegramRetryAfter(method, "Too Many Requests", self.retry_after)
+            if self.flood_rate and random.random() < self.flood_rate:
+                raise TelegramRetryAfter(method, "Too Many Requests", self.retry_after)
+            if chat_id in self.blocked_ids:
+                raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+            if isinstance(method, SendMessage):
+                return Message(
+                    message_id=len(self.requests),
+                    date=datetime.now(),
+                    chat=Chat(id=chat_id, type="private"),
+                    text=method.text,
+                )
+            return True
+        finally:
+            self.in_flight -= 1
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def make_fake_bot(**session_kwargs) -> Bot:
+    """Создаёт настоящий aiogram Bot, работающий через FakeSession."""
+    return Bot(token=FAKE_TOKEN, session=FakeSession(**session_kwargs))
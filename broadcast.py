@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from config import BROADCAST_RATE, BROADCAST_WORKERS, BROADCAST_PER_CHAT_INTERVAL, BROADCAST_MAX_RETRIES
+from metrics import SEND_SECONDS, SENT_MESSAGES, SEND_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ограничитель частоты: не больше rate операций в секунду с запасом burst."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждёт, пока в ведре появится токен, и забирает его."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def set_rate(self, rate: float):
+        """Меняет частоту; уже накопленные токены сохраняются."""
+        self._refill(time.monotonic())
+        self.rate = rate
+
+    def pause(self, seconds: float):
+        """Приостанавливает выдачу токенов (например, после flood-ошибки Telegram)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+# Общий ограничитель отправок процесса: уведомления из очереди и рассылка администратора
+# расходуют один лимит Telegram, а не каждая свой
+send_limiter = TokenBucket(BROADCAST_RATE, burst=BROADCAST_WORKERS)
+
+
+@dataclass
+class BroadcastStats:
+    """Итоги рассылки."""
+    total: int = 0
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    retries: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"всего {self.total}, отправлено {self.sent}, заблокировали {self.blocked}, "
+            f"ошибок {self.failed}, повторов {self.retries}, "
+            f"время {self.elapsed:.1f} с, скорость {self.throughput:.1f} сообщ./с"
+        )
+
+
+async def _iterate(messages):
+    if hasattr(messages, "__aiter__"):
+        async for item in messages:
+            yield item
+    else:
+        for item in messages:
+            yield item
+
+
+async def _send(bot: Bot, chat_id, text):
+    started = time.perf_counter()
+    try:
+        await bot.send_message(chat_id, text)
+    except Exception as e:
+        SEND_ERRORS.inc(type(e).__name__)
+        raise
+    finally:
+        SEND_SECONDS.observe(time.perf_counter() - started)
+    SENT_MESSAGES.inc()
+
+
+async def broadcast(bot: Bot, messages, *, workers: int = BROADCAST_WORKERS, rate: float = BROADCAST_RATE,
+                    per_chat_interval: float = BROADCAST_PER_CHAT_INTERVAL, max_retries: int = BROADCAST_MAX_RETRIES,
+                    limiter: TokenBucket = None, on_sent=None, on_blocked=None) -> BroadcastStats:
+    """
+    Рассылает сообщения пулом из workers задач.
+
+    messages — итерируемый (или асинхронно итерируемый) набор пар (chat_id, text),
+    не больше одного сообщения на чат: пауза per_chat_interval выдерживается между
+    повторными попытками отправить одно сообщение.
+    limiter — ограничитель частоты, общий с другими отправками (обычно send_limiter);
+    без него рассылка получает свой на rate сообщений в секунду.
+    on_sent(chat_id) и on_blocked(chat_id) — необязательные корутины-обработчики результата.
+    """
+    stats = BroadcastStats()
+    if limiter is None:
+        limiter = TokenBucket(rate, burst=workers)
+    # Время последней попытки по чатам, сообщение в которые ещё отправляется; после отправки
+    # запись удаляется, иначе рассылка по всей базе держала бы в памяти по записи на пользователя
+    last_sent_to_chat = {}
+    queue = asyncio.Queue(maxsize=workers * 2)
+
+    async def deliver(chat_id, text):
+        for attempt in range(max_retries + 1):
+            # Telegram не пропускает больше одного сообщения в секунду в один чат
+            wait = last_sent_to_chat.get(chat_id, 0.0) + per_chat_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await limiter.acquire()
+            last_sent_to_chat[chat_id] = time.monotonic()
+            try:
+                await _send(bot, chat_id, text)
+            except TelegramRetryAfter as e:
+                stats.retries += 1
+                logger.warning(f"Flood-лимит Telegram, пауза {e.retry_after} с (пользователь {chat_id})")
+                limiter.pause(e.retry_after)
+                continue
+            except TelegramForbiddenError:
+                stats.blocked += 1
+                if on_blocked is not None:
+                    await on_blocked(chat_id)
+                return
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"Ошибка при отправке сообщения пользователю {chat_id}: {e}")
+                return
+            stats.sent += 1
+            if on_sent is not None:
+                await on_sent(chat_id)
+            return
+        stats.failed += 1
+        logger.error(f"Не удалось отправить сообщение пользователю {chat_id}: превышено число попыток")
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                try:
+                    await deliver(*item)
+                except Exception as e:
+                    stats.failed += 1
+                    logger.error(f"Ошибка в обработчике рассылки для пользователя {item[0]}: {e}")
+                finally:
+                    last_sent_to_chat.pop(item[0], None)
+            finally:
+                queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        async for item in _iterate(messages):
+            stats.total += 1
+            await queue.put(item)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        stats.finished = time.monotonic()
+
+    logger.info(f"Рассылка завершена: {stats.summary()}")
+    return stats
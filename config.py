@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Загружаем переменные из .env
@@ -6,3 +7,95 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")  # Токен Telegram бота
 ADMIN_ID = int(os.getenv("ADMIN_ID"))  # ID администратора
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Уровень логирования
+
+# База данных
+DB_PATH = os.getenv("DB_PATH", "users.db")  # Путь к базе данных
+DB_READERS = int(os.getenv("DB_READERS", "2"))  # Соединений для чтения в пуле
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "1000"))  # Строк за одну выборку при переборе пользователей
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "1"))  # Как часто сбрасывать буфер записи, сек
+WRITE_BEHIND_SIZE = int(os.getenv("WRITE_BEHIND_SIZE", "500"))  # Сбрасывать буфер раньше, если накопилось столько записей
+
+# Параметры рассылки (лимиты Telegram: ~30 сообщений в секунду всего и 1 в секунду в один чат)
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "16"))  # Число одновременных отправок
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))  # Сообщений в секунду на весь бот, делится между процессами
+BROADCAST_PER_CHAT_INTERVAL = float(os.getenv("BROADCAST_PER_CHAT_INTERVAL", "1"))  # Секунд между сообщениями в один чат
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))  # Повторов после flood-ошибки
+
+# Параметры планировщика уведомлений
+TIMEZONE = os.getenv("TIMEZONE")  # Часовой пояс уведомлений (например, Europe/Moscow), по умолчанию системный
+NOTIFY_HOUR = int(os.getenv("NOTIFY_HOUR", "9"))  # Час отправки уведомлений
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "1000"))  # Пользователей за одну выборку
+SCHEDULER_MAX_SLEEP = int(os.getenv("SCHEDULER_MAX_SLEEP", "60"))  # Максимальная пауза между проверками, сек
+NOTIFY_MILESTONE_WEEKS = int(os.getenv("NOTIFY_MILESTONE_WEEKS", "1000"))  # Круглые даты: каждые столько недель, 0 — не отмечать
+
+# Очередь уведомлений (таблица outbox)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))  # Уведомлений, забираемых из очереди за раз
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # Максимальная пауза между проверками очереди, сек
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))  # После стольких неудач уведомление уходит в dead
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "60"))  # Пауза перед первым повтором, сек; дальше удваивается
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))  # Максимальная пауза между повторами, сек
+
+# Фоновая перепроверка блокировок. Основной источник — события my_chat_member и ошибки отправки,
+# поэтому перепроверка по умолчанию выключена и трогает только давно не проверенных пользователей
+BLOCK_SWEEP_ENABLED = os.getenv("BLOCK_SWEEP_ENABLED", "0") == "1"
+BLOCK_SWEEP_STALE_DAYS = int(os.getenv("BLOCK_SWEEP_STALE_DAYS", "30"))  # Перепроверять, если не проверяли столько дней
+BLOCK_SWEEP_BATCH = int(os.getenv("BLOCK_SWEEP_BATCH", "100"))  # Пользователей за один проход
+BLOCK_SWEEP_INTERVAL = int(os.getenv("BLOCK_SWEEP_INTERVAL", "3600"))  # Пауза между проходами, сек
+BLOCK_SWEEP_RATE = float(os.getenv("BLOCK_SWEEP_RATE", "1"))  # Запросов к API в секунду
+
+# Цитаты
+QUOTES_PATH = os.getenv("QUOTES_PATH", "quotes.txt")  # Файл с цитатами, по одной на строку
+QUOTES_CHECK_INTERVAL = float(os.getenv("QUOTES_CHECK_INTERVAL", "5"))  # Как часто проверять изменение файла, сек
+QUOTES_ROTATION_USERS = int(os.getenv("QUOTES_ROTATION_USERS", "100000"))  # Сколько пользователей помнить для цитат без повторов
+
+# Кэш показанных фактов в статусе
+FACTS_CACHE_SIZE = int(os.getenv("FACTS_CACHE_SIZE", "100000"))  # Сколько пользователей помнить
+FACTS_CACHE_TTL = float(os.getenv("FACTS_CACHE_TTL", str(7 * 24 * 60 * 60)))  # Сколько секунд помнить
+
+# Ограничение частоты сообщений одного пользователя (см. throttling.py)
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))  # Сообщений в секунду
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))  # Сколько сообщений можно отправить подряд
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "100000"))  # Сколько пользователей помнить
+
+# Кэш статуса: имя, дата рождения и число недель не меняются до начала новой недели жизни
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", "100000"))
+
+# Хранилище состояний диалога (регистрации)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")  # memory — в памяти процесса, sqlite — в базе бота
+FSM_TTL = float(os.getenv("FSM_TTL", str(24 * 60 * 60)))  # Через сколько секунд забывать брошенную регистрацию
+FSM_MAX_ENTRIES = int(os.getenv("FSM_MAX_ENTRIES", "100000"))  # Максимум диалогов в памяти
+FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", "600"))  # Как часто удалять брошенные диалоги, сек
+
+# Способ получения обновлений: polling или webhook; worker — только планировщик, без приёма обновлений
+RUN_MODE = os.getenv("RUN_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Внешний адрес бота, например https://bot.example.com; если не задан, вебхук не регистрируется
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Секрет из заголовка X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))  # Задач, обрабатывающих обновления
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))  # Максимум обновлений в очереди
+WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", "1"))  # Сколько ждать места в очереди, сек
+
+# Несколько процессов. Пользователи делятся на SHARD_COUNT частей (user_id % SHARD_COUNT);
+# часть обслуживает процесс, который держит её аренду в таблице scheduler_leases.
+# Все процессы должны работать с одним файлом базы, то есть на одной машине
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"  # Запускать планировщик в этом процессе
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))  # Одинаковое во всех процессах
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"  # Имя процесса в таблице аренд
+LEASE_TTL = float(os.getenv("LEASE_TTL", "30"))  # Через сколько секунд без продления аренду заберёт другой процесс
+LEASE_RENEW_INTERVAL = float(os.getenv("LEASE_RENEW_INTERVAL", "10"))  # Как часто продлевать аренды, сек
+
+# Работа с файлами и контроль цикла событий (см. fileio.py и loop_monitor.py)
+FILE_IO_WORKERS = int(os.getenv("FILE_IO_WORKERS", "4"))  # Потоков для чтения файлов и другой блокирующей работы
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))  # Как часто проверять задержку цикла событий, сек
+LOOP_LAG_WARN = float(os.getenv("LOOP_LAG_WARN", "0.02"))  # Предупреждать, если цикл был занят дольше, сек
+
+# Команды администратора (см. admin.py)
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "15"))  # Пользователей на странице бан-листа (лимит сообщения — 4096 символов)
+
+# Метрики (см. metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Порт для /metrics; 0 — только команда /метрики
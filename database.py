@@ -1,88 +1,774 @@
+import asyncio
+import logging
+import time
 import aiosqlite
-from config import DB_PATH
-from datetime import datetime
+from contextlib import asynccontextmanager
+from config import DB_PATH, DB_READERS, DB_BATCH_SIZE, WRITE_BEHIND_INTERVAL, WRITE_BEHIND_SIZE
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+from utils import parse_birthdate, next_notify_at
+from metrics import DB_QUERY_SECONDS
+import fileio
 
-# Глобальное соединение с базой данных
+# Одно соединение для записи (SQLite всё равно допускает только одного писателя)
+# и небольшой пул соединений для чтения. В режиме WAL чтение не блокирует запись.
 _db_connection = None
+_readers = None
+_reader_connections = []
+_connect_lock = asyncio.Lock()
+# Соединение для записи общее, поэтому транзакции записи идут строго по одной: иначе commit()
+# одной корутины зафиксировал бы недописанные изменения другой, а rollback() — отменил их
+_write_lock = asyncio.Lock()
+_schema_ready = False  # Схема уже проверена этим процессом
+
+# Тексты запросов вынесены в константы: одинаковый текст позволяет sqlite3
+# повторно использовать подготовленные выражения из кэша соединения
+SELECT_USER = "SELECT user_id, name, birth_ordinal, last_notified_week, username FROM users WHERE user_id = ?"
+INSERT_USER = (
+    "INSERT OR REPLACE INTO users (user_id, name, birth_ordinal, username, next_notify_at, birthdate) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+DELETE_USER = "DELETE FROM users WHERE user_id = ?"
+# Идёт по индексу UNIQUE (user_id, week)
+DELETE_USER_OUTBOX = "DELETE FROM outbox WHERE user_id = ?"
+SELECT_USERS_PAGE = (
+    "SELECT user_id, name, birth_ordinal, last_notified_week, username FROM users "
+    "WHERE user_id > ? ORDER BY user_id LIMIT ?"
+)
+# Пользователи поделены между процессами по user_id % число_частей; при одной части условие всегда истинно
+SELECT_NEXT_NOTIFY_AT = (
+    "SELECT next_notify_at FROM users "
+    "WHERE next_notify_at IS NOT NULL AND user_id % ? = ? ORDER BY next_notify_at LIMIT 1"
+)
+SELECT_DUE_USERS = (
+    "SELECT user_id, name, birth_ordinal, last_notified_week, username FROM users "
+    "WHERE next_notify_at <= ? AND user_id % ? = ? ORDER BY next_notify_at LIMIT ?"
+)
+# Неделя отмечается при постановке уведомления в очередь и только если её ещё никто не отметил,
+# поэтому пользователя, выбранного двумя процессами, уведомит только один из них
+CLAIM_WEEK = (
+    "UPDATE users SET last_notified_week = ? "
+    "WHERE user_id = ? AND (last_notified_week IS NULL OR last_notified_week < ?)"
+)
+INSERT_OUTBOX = (
+    "INSERT OR IGNORE INTO outbox (user_id, week, text, next_attempt_at) VALUES (?, ?, ?, ?)"
+)
+SELECT_OUTBOX_READY = (
+    "SELECT id, user_id, text, attempts FROM outbox "
+    "WHERE status = 'pending' AND next_attempt_at <= ? AND user_id % ? = ? ORDER BY next_attempt_at LIMIT ?"
+)
+SELECT_OUTBOX_NEXT_ATTEMPT = (
+    "SELECT next_attempt_at FROM outbox "
+    "WHERE status = 'pending' AND user_id % ? = ? ORDER BY next_attempt_at LIMIT 1"
+)
+CLAIM_OUTBOX = "UPDATE outbox SET status = 'sending', claimed_by = ? WHERE id = ? AND status = 'pending'"
+DELETE_OUTBOX = "DELETE FROM outbox WHERE id = ?"
+RETRY_OUTBOX = (
+    "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, claimed_by = NULL WHERE id = ?"
+)
+# Отправку, которую начал умерший процесс (или этот же до перезапуска), возвращаем в очередь
+RECOVER_OUTBOX = (
+    "UPDATE outbox SET status = 'pending', claimed_by = NULL WHERE status = 'sending' AND (claimed_by = ? "
+    "OR claimed_by NOT IN (SELECT worker_id FROM scheduler_workers WHERE expires_at > ?))"
+)
+UPDATE_NEXT_NOTIFY_AT = "UPDATE users SET next_notify_at = ? WHERE user_id = ?"
+INSERT_BLOCKED = "INSERT OR IGNORE INTO blocked_users (user_id, blocked_at) VALUES (?, ?)"
+DELETE_BLOCKED = "DELETE FROM blocked_users WHERE user_id = ?"
+SELECT_BLOCKED_IDS = "SELECT user_id FROM blocked_users"
+# Два отдельных запроса, а не «IS NULL OR < ?»: с OR SQLite просматривал бы весь индекс
+# idx_users_block_checked_at, когда давно не проверенных меньше, чем LIMIT
+SELECT_UNCHECKED_USERS = "SELECT user_id FROM users WHERE block_checked_at IS NULL LIMIT ?"
+SELECT_STALE_USERS = (
+    "SELECT user_id FROM users WHERE block_checked_at < ? ORDER BY block_checked_at LIMIT ?"
+)
+UPDATE_BLOCK_CHECKED_AT = "UPDATE users SET block_checked_at = ? WHERE user_id = ?"
+SELECT_FSM_RECORD = "SELECT state, data FROM fsm_states WHERE key = ? AND expires_at > ?"
+UPSERT_FSM_STATE = (
+    "INSERT INTO fsm_states (key, state, data, expires_at) VALUES (?, ?, '{}', ?) "
+    "ON CONFLICT (key) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at"
+)
+UPSERT_FSM_DATA = (
+    "INSERT INTO fsm_states (key, state, data, expires_at) VALUES (?, NULL, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at"
+)
+DELETE_EMPTY_FSM_RECORD = "DELETE FROM fsm_states WHERE key = ? AND state IS NULL AND data = '{}'"
+DELETE_EXPIRED_FSM_RECORDS = "DELETE FROM fsm_states WHERE expires_at <= ?"
+ACQUIRE_LEASE = (
+    "INSERT INTO scheduler_leases (shard, owner, expires_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (shard) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+    "WHERE scheduler_leases.owner = excluded.owner OR scheduler_leases.expires_at <= ?"
+)
+RELEASE_LEASE = "DELETE FROM scheduler_leases WHERE shard = ? AND owner = ?"
+SELECT_LEASES = "SELECT shard, owner FROM scheduler_leases WHERE expires_at > ?"
+UPSERT_WORKER = (
+    "INSERT INTO scheduler_workers (worker_id, expires_at) VALUES (?, ?) "
+    "ON CONFLICT (worker_id) DO UPDATE SET expires_at = excluded.expires_at"
+)
+DELETE_WORKER = "DELETE FROM scheduler_workers WHERE worker_id = ?"
+DELETE_EXPIRED_WORKERS = "DELETE FROM scheduler_workers WHERE expires_at <= ?"
+SELECT_WORKERS = "SELECT worker_id FROM scheduler_workers WHERE expires_at > ?"
+# Страница заблокировавших по порядку блокировки, начиная после пары (blocked_at, user_id) последней
+# записи предыдущей страницы (идёт по индексу idx_blocked_users_blocked_at, поэтому любая страница стоит одинаково)
+SELECT_BLOCKED_PAGE = (
+    "SELECT b.user_id, b.blocked_at, u.name, u.birth_ordinal, u.username "
+    "FROM blocked_users b LEFT JOIN users u ON u.user_id = b.user_id "
+    "WHERE (b.blocked_at, b.user_id) > (?, ?) "
+    "ORDER BY b.blocked_at, b.user_id LIMIT ?"
+)
+COUNT_BLOCKED = "SELECT COUNT(*) FROM blocked_users"
+SELECT_OUTBOX_DEPTH = "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+
+# Имя запроса для метрик — имя его константы
+_QUERY_NAMES = {
+    value: name.lower() for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, str) and value.startswith(("SELECT", "INSERT", "UPDATE", "DELETE"))
+}
+
+logger = logging.getLogger(__name__)
+
+
+class UserRecord(NamedTuple):
+    """
+    Компактная запись пользователя.
+
+    Дата рождения хранится как порядковый номер дня (date.toordinal()), поэтому
+    число прожитых недель — это (сегодня.toordinal() - birth_ordinal) // 7.
+    None — если в базе была некорректная дата.
+    """
+    user_id: int
+    name: str
+    birth_ordinal: Optional[int]
+    last_notified_week: Optional[int]
+    username: Optional[str]
+
+
+class BlockedUser(NamedTuple):
+    """Пользователь, заблокировавший бота; name и остальное None, если его нет в таблице users."""
+    user_id: int
+    blocked_at: str
+    name: Optional[str]
+    birth_ordinal: Optional[int]
+    username: Optional[str]
+
+
+class WriteBehindBuffer:
+    """
+    Буфер отложенной записи.
+
+    Новые пользователи и смена статуса блокировки копятся в памяти и пишутся
+    одной транзакцией через executemany — раз в WRITE_BEHIND_INTERVAL секунд
+    или как только накопится WRITE_BEHIND_SIZE записей.
+    """
+
+    def __init__(self, flush_interval: float, flush_size: int):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.inserts = {}  # user_id -> строка для INSERT_USER
+        self.blocks = {}  # user_id -> время блокировки или None, если пользователь разблокировал бота
+        self._flushing = {}  # Вставки, которые сейчас пишутся в базу
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def __len__(self):
+        return len(self.inserts) + len(self.blocks)
+
+    async def add_insert(self, row):
+        self.inserts[row[0]] = row
+        await self._maybe_flush()
+
+    async def add_block(self, user_id, blocked_at):
+        self.blocks[user_id] = blocked_at
+        await self._maybe_flush()
+
+    def pending_insert(self, user_id):
+        """Строка пользователя, ещё не записанная в базу, или None."""
+        return self.inserts.get(user_id) or self._flushing.get(user_id)
+
+    def discard(self, user_id):
+        self.inserts.pop(user_id, None)
+
+    async def _maybe_flush(self):
+        if len(self) >= self.flush_size:
+            await self.flush()
+
+    async def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        async with self._lock:
+            if not len(self):
+                return
+            inserts, self.inserts = self.inserts, {}
+            blocks, self.blocks = self.blocks, {}
+            self._flushing = inserts
+            started = time.perf_counter()
+            try:
+                async with write_transaction() as db:
+                    await db.executemany(INSERT_USER, inserts.values())
+                    await db.executemany(DELETE_BLOCKED, [(user_id,) for user_id in blocks])
+                    await db.executemany(
+                        INSERT_BLOCKED, [(user_id, at) for user_id, at in blocks.items() if at is not None]
+                    )
+            except Exception as e:
+                # Возвращаем несохранённое в буфер, более свежие значения не затираем
+                self.inserts = {**inserts, **self.inserts}
+                self.blocks = {**blocks, **self.blocks}
+                logger.error(f"Ошибка при записи буфера в базу данных: {e}")
+                raise
+            finally:
+                self._flushing = {}
+                _observe("write_behind_flush", started)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # Ошибка уже залогирована, повторим на следующем цикле
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+_write_buffer = WriteBehindBuffer(WRITE_BEHIND_INTERVAL, WRITE_BEHIND_SIZE)
+
+# Копия таблицы blocked_users в памяти: проверка при рассылке — O(1) без обращения к базе
+_blocked = set()
+
+async def flush_writes():
+    """Немедленно записывает буфер отложенной записи."""
+    await _write_buffer.flush()
+
+async def _connect():
+    db = await aiosqlite.connect(DB_PATH)
+    await db.execute("PRAGMA journal_mode = WAL")
+    await db.execute("PRAGMA synchronous = NORMAL")
+    await db.execute("PRAGMA foreign_keys = ON")
+    return db
 
 async def get_db_connection():
+    """Соединение для записи."""
     global _db_connection
     if _db_connection is None:
-        _db_connection = await aiosqlite.connect(DB_PATH)
-        await _db_connection.execute("PRAGMA foreign_keys = ON")
+        async with _connect_lock:
+            if _db_connection is None:
+                _db_connection = await _connect()
     return _db_connection
 
+@asynccontextmanager
+async def write_transaction():
+    """
+    Транзакция записи: фиксируется при выходе из блока и откатывается при исключении.
+
+    BEGIN IMMEDIATE сразу берёт блокировку записи базы, поэтому конфликт с другим процессом
+    (SQLITE_BUSY) случается до первого изменения, а не посреди транзакции.
+    """
+    async with _write_lock:
+        db = await get_db_connection()
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+
+@asynccontextmanager
+async def read_connection():
+    """Берёт соединение для чтения из пула и возвращает его обратно."""
+    global _readers
+    if _readers is None:
+        async with _connect_lock:
+            if _readers is None:
+                readers = asyncio.Queue()
+                for _ in range(DB_READERS):
+                    db = await _connect()
+                    _reader_connections.append(db)
+                    readers.put_nowait(db)
+                _readers = readers
+    db = await _readers.get()
+    try:
+        yield db
+    finally:
+        _readers.put_nowait(db)
+
+def _observe(name, started):
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, name)
+
+async def _fetchone(query, params=()):
+    started = time.perf_counter()
+    async with read_connection() as db:
+        cursor = await db.execute(query, params)
+        row = await cursor.fetchone()
+    _observe(_QUERY_NAMES.get(query, "other"), started)
+    return row
+
+async def _fetchall(query, params=()):
+    started = time.perf_counter()
+    async with read_connection() as db:
+        cursor = await db.execute(query, params)
+        rows = await cursor.fetchall()
+    _observe(_QUERY_NAMES.get(query, "other"), started)
+    return rows
+
 async def close_db_connection():
-    global _db_connection
+    global _db_connection, _readers
+    await _write_buffer.stop()
     if _db_connection is not None:
         await _db_connection.close()
         _db_connection = None
+    for db in _reader_connections:
+        await db.close()
+    _reader_connections.clear()
+    _readers = None
 
-async def init_db():
-    db = await get_db_connection()
+async def _migrate_next_notify_at(db):
+    """Время следующего уведомления и индекс по нему."""
+    cursor = await db.execute("PRAGMA table_info(users)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    if "next_notify_at" not in columns:
+        await db.execute("ALTER TABLE users ADD COLUMN next_notify_at INTEGER")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_next_notify_at ON users (next_notify_at)")
+
+    cursor = await db.execute("SELECT user_id, birthdate FROM users WHERE next_notify_at IS NULL")
+    schedule = []
+    for user_id, birthdate in await cursor.fetchall():
+        try:
+            schedule.append((next_notify_at(parse_birthdate(birthdate).toordinal()), user_id))
+        except (TypeError, ValueError):  # NULL или некорректная дата: такого пользователя не планируем
+            continue
+    await db.executemany(UPDATE_NEXT_NOTIFY_AT, schedule)
+
+async def _migrate_birth_ordinal(db):
+    """Дата рождения в виде номера дня вместо строки, которую приходилось разбирать при каждом чтении."""
+    await db.execute("ALTER TABLE users ADD COLUMN birth_ordinal INTEGER")
+    cursor = await db.execute("SELECT user_id, birthdate FROM users")
+    ordinals = []
+    for user_id, birthdate in await cursor.fetchall():
+        try:
+            birth_date = parse_birthdate(birthdate)
+        except (TypeError, ValueError):
+            logger.warning(f"Некорректная дата рождения у пользователя {user_id}: {birthdate}")
+            continue
+        # Заодно приводим строковую дату к единому формату YYYY-MM-DD
+        ordinals.append((birth_date.toordinal(), birth_date.isoformat(), user_id))
+    await db.executemany("UPDATE users SET birth_ordinal = ?, birthdate = ? WHERE user_id = ?", ordinals)
+
+async def _migrate_due_index(db):
+    """Покрывающий индекс для выборки пользователей, которым пора отправить уведомление."""
+    # Все столбцы SELECT_DUE_USERS есть в индексе, поэтому выборка не обращается к самой таблице
+    # и её стоимость зависит только от числа получателей, а не от размера базы
+    await db.execute("DROP INDEX IF EXISTS idx_users_next_notify_at")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_due "
+        "ON users (next_notify_at, user_id, name, birth_ordinal, last_notified_week, username)"
+    )
+
+async def _migrate_blocked_users(db):
+    """Таблица заблокировавших бота пользователей вместо файла blocked_users.txt."""
     await db.execute("""
-    CREATE TABLE IF NOT EXISTS users (
+    CREATE TABLE IF NOT EXISTS blocked_users (
         user_id INTEGER PRIMARY KEY,
-        name TEXT NOT NULL,
-        birthdate DATE NOT NULL,
-        last_notified_week INTEGER DEFAULT 0,
-        username TEXT
+        blocked_at TEXT NOT NULL
     )
     """)
-    await db.commit()
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_blocked_users_blocked_at ON blocked_users (blocked_at)")
 
-async def add_user(user_id, name, birthdate, username):
-    # Преобразуем дату в формат YYYY-MM-DD для хранения в базе данных
+    # Переносим записи из старого файла
     try:
-        birthdate_dt = datetime.strptime(birthdate, "%d.%m.%Y")
-        birthdate_db_format = birthdate_dt.strftime("%Y-%m-%d")
-    except ValueError:
-        # Если дата уже в формате YYYY-MM-DD, оставляем её как есть
-        birthdate_db_format = birthdate
-    
+        lines = (await fileio.read_text("blocked_users.txt")).splitlines()
+    except FileNotFoundError:
+        return
+    blocked = []
+    for line in lines:
+        try:
+            user_id, block_time = line.strip().split(":", 1)
+            blocked.append((int(user_id), block_time))
+        except ValueError:
+            logger.warning(f"Некорректная строка в файле blocked_users.txt: {line.strip()}")
+    await db.executemany(INSERT_BLOCKED, blocked)
+
+async def _migrate_block_checked_at(db):
+    """Время последней проверки блокировки, чтобы перепроверять только давно не проверенных пользователей."""
+    await db.execute("ALTER TABLE users ADD COLUMN block_checked_at INTEGER")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_block_checked_at ON users (block_checked_at)")
+
+async def _migrate_fsm_states(db):
+    """Таблица состояний диалога (регистрации), чтобы они переживали перезапуск."""
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS fsm_states (
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT NOT NULL DEFAULT '{}',
+        expires_at REAL NOT NULL
+    )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_expires_at ON fsm_states (expires_at)")
+
+async def _migrate_scheduler_leases(db):
+    """Таблицы аренд частей пользователей и живых процессов планировщика."""
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_leases (
+        shard INTEGER PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_workers (
+        worker_id TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    )
+    """)
+
+async def _migrate_outbox(db):
+    """Очередь уведомлений к отправке, которая переживает перезапуск."""
+    # Доставленные уведомления удаляются; status — pending (ждёт отправки), sending (отправляется)
+    # или dead (попытки исчерпаны, остаётся для разбора)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        week INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        claimed_by TEXT,
+        UNIQUE (user_id, week)
+    )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (status, next_attempt_at, user_id)")
+
+# Миграции схемы по порядку; номер последней применённой хранится в PRAGMA user_version
+MIGRATIONS = [
+    _migrate_next_notify_at,
+    _migrate_birth_ordinal,
+    _migrate_due_index,
+    _migrate_blocked_users,
+    _migrate_block_checked_at,
+    _migrate_fsm_states,
+    _migrate_scheduler_leases,
+    _migrate_outbox,
+]
+
+async def _schema_version(db):
+    cursor = await db.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+async def init_db():
+    """
+    Готовит базу к работе: создаёт схему, применяет миграции и загружает список блокировок.
+
+    Если схема уже актуальна (обычный перезапуск), это одно чтение PRAGMA user_version
+    без пишущей транзакции, поэтому перезапуск не ждёт блокировки записи у других процессов.
+    Повторный вызов в том же процессе схему не проверяет.
+    """
+    global _schema_ready
     db = await get_db_connection()
-    await db.execute("INSERT INTO users (user_id, name, birthdate, username) VALUES (?, ?, ?, ?)", (user_id, name, birthdate_db_format, username))
-    await db.commit()
+    if not _schema_ready and await _schema_version(db) < len(MIGRATIONS):
+        # Блокировка записи берётся сразу: если несколько процессов запускаются одновременно,
+        # миграции применит первый, а остальные увидят уже новую версию
+        async with write_transaction() as db:
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                birthdate DATE NOT NULL,
+                last_notified_week INTEGER DEFAULT 0,
+                username TEXT
+            )
+            """)
+            version = await _schema_version(db)
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                logger.info(f"Миграция базы данных {number}: {migration.__doc__}")
+                await migration(db)
+                await db.execute(f"PRAGMA user_version = {number}")
+    _schema_ready = True
+
+    await reload_blocked()
+    _write_buffer.start()
+
+async def add_user(user_id, name, birth_date: date, username):
+    birth_ordinal = birth_date.toordinal()
+    notify_at = next_notify_at(birth_ordinal)
+    await _write_buffer.add_insert((user_id, name, birth_ordinal, username, notify_at, birth_date.isoformat()))
 
 async def get_user(user_id):
-    db = await get_db_connection()
-    cursor = await db.execute("SELECT name, birthdate, username FROM users WHERE user_id = ?", (user_id,))
-    result = await cursor.fetchone()
-    if result:
-        name, birthdate, username = result
-        try:
-            # Пытаемся преобразовать дату из формата YYYY-MM-DD
-            birthdate_dt = datetime.strptime(birthdate, "%Y-%m-%d")
-            birthdate_user_format = birthdate_dt.strftime("%d.%m.%Y")
-        except ValueError:
-            # Если дата уже в формате DD.MM.YYYY, оставляем её как есть
-            birthdate_user_format = birthdate
-        return name, birthdate_user_format, username
-    return None
+    """Возвращает UserRecord или None, если пользователь не зарегистрирован."""
+    pending = _write_buffer.pending_insert(user_id)
+    if pending:
+        # Пользователь ещё в буфере отложенной записи
+        user_id, name, birth_ordinal, username = pending[:4]
+        return UserRecord(user_id, name, birth_ordinal, None, username)
+    result = await _fetchone(SELECT_USER, (user_id,))
+    return UserRecord(*result) if result else None
 
 async def delete_user(user_id):
-    db = await get_db_connection()
-    await db.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-    await db.commit()
+    _write_buffer.discard(user_id)
+    async with write_transaction() as db:
+        await db.execute(DELETE_USER, (user_id,))
+        # Уведомления прежней регистрации не нужны, а их строки помешали бы поставить в очередь новые
+        await db.execute(DELETE_USER_OUTBOX, (user_id,))
 
-async def update_last_notified_week(user_id, weeks_lived):
-    db = await get_db_connection()
-    await db.execute("UPDATE users SET last_notified_week = ? WHERE user_id = ?", (weeks_lived, user_id))
-    await db.commit()
+async def iter_users(batch_size: int = DB_BATCH_SIZE):
+    """
+    Перебирает всех пользователей порциями по batch_size, не загружая таблицу целиком.
 
-async def get_all_users():
-    db = await get_db_connection()
-    cursor = await db.execute("SELECT user_id, name, birthdate, last_notified_week, username FROM users")
-    users = await cursor.fetchall()
-    # Преобразуем дату обратно в формат DD.MM.YYYY
-    formatted_users = []
-    for user_id, name, birthdate, last_notified_week, username in users:
-        try:
-            # Пытаемся преобразовать дату из формата YYYY-MM-DD
-            birthdate_dt = datetime.strptime(birthdate, "%Y-%m-%d")
-            birthdate_user_format = birthdate_dt.strftime("%d.%m.%Y")
-        except ValueError:
-            # Если дата уже в формате DD.MM.YYYY, оставляем её как есть
-            birthdate_user_format = birthdate
-        formatted_users.append((user_id, name, birthdate_user_format, last_notified_week, username))
-    return formatted_users
+    Порции выбираются по первичному ключу (user_id > последнего выданного),
+    поэтому каждая следующая выборка стоит одинаково.
+    """
+    await _write_buffer.flush()
+    last_id = -1
+    while True:
+        rows = await _fetchall(SELECT_USERS_PAGE, (last_id, batch_size))
+        for row in rows:
+            yield UserRecord(*row)
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+async def get_next_notify_at(shards=(0,), shard_count=1):
+    """Время ближайшего запланированного уведомления в частях shards (берётся из индекса)."""
+    times = []
+    for shard in shards:
+        result = await _fetchone(SELECT_NEXT_NOTIFY_AT, (shard_count, shard))
+        if result is not None:
+            times.append(result[0])
+    return min(times, default=None)
+
+async def get_due_users(now_ts, limit, shards=(0,), shard_count=1):
+    """Пользователи из частей shards, время уведомления которых уже наступило."""
+    users = []
+    for shard in shards:
+        rows = await _fetchall(SELECT_DUE_USERS, (now_ts, shard_count, shard, limit - len(users)))
+        users.extend(UserRecord(*row) for row in rows)
+        if len(users) >= limit:
+            break
+    return users
+
+async def enqueue_notifications(entries, now):
+    """
+    Ставит уведомления в очередь (таблица outbox): entries — тройки (user_id, weeks_lived, text).
+
+    Неделя отмечается в users и уведомление записывается в очередь одной транзакцией
+    (write_transaction), поэтому после сбоя не бывает ни отмеченной недели без уведомления,
+    ни двух уведомлений об одной неделе. Возвращает число поставленных в очередь;
+    остальных уже поставил другой процесс.
+    """
+    await _write_buffer.flush()
+    started = time.perf_counter()
+    queued = 0
+    try:
+        async with write_transaction() as db:
+            for user_id, weeks_lived, text in entries:
+                cursor = await db.execute(CLAIM_WEEK, (weeks_lived, user_id, weeks_lived))
+                if cursor.rowcount:
+                    cursor = await db.execute(INSERT_OUTBOX, (user_id, weeks_lived, text, now))
+                    queued += cursor.rowcount
+    finally:
+        _observe("enqueue_notifications", started)
+    return queued
+
+async def claim_outbox(now, limit, worker_id, shards=(0,), shard_count=1):
+    """
+    Забирает из очереди до limit готовых к отправке уведомлений из частей shards.
+
+    Возвращает список (id, user_id, text, attempts); у одного пользователя в порции
+    не больше одного уведомления. Взятые записи получают статус sending.
+    """
+    rows = []
+    for shard in shards:
+        rows.extend(await _fetchall(SELECT_OUTBOX_READY, (now, shard_count, shard, limit - len(rows))))
+        if len(rows) >= limit:
+            break
+    started = time.perf_counter()
+    claimed, user_ids = [], set()
+    try:
+        async with write_transaction() as db:
+            for row in rows:
+                if row[1] in user_ids:
+                    continue
+                cursor = await db.execute(CLAIM_OUTBOX, (worker_id, row[0]))
+                if cursor.rowcount:
+                    claimed.append(row)
+                    user_ids.add(row[1])
+    finally:
+        _observe("claim_outbox", started)
+    return claimed
+
+async def get_next_outbox_attempt(shards=(0,), shard_count=1):
+    """Время ближайшей попытки отправки из очереди в частях shards или None, если очередь пуста."""
+    times = []
+    for shard in shards:
+        result = await _fetchone(SELECT_OUTBOX_NEXT_ATTEMPT, (shard_count, shard))
+        if result is not None:
+            times.append(result[0])
+    return min(times, default=None)
+
+async def finish_outbox(done_ids, retries):
+    """
+    Записывает итог отправки порции: done_ids — доставленные или ненужные больше уведомления,
+    retries — четвёрки (status, attempts, next_attempt_at, id) для повтора или dead.
+    """
+    started = time.perf_counter()
+    async with write_transaction() as db:
+        await db.executemany(DELETE_OUTBOX, [(outbox_id,) for outbox_id in done_ids])
+        await db.executemany(RETRY_OUTBOX, retries)
+    _observe("finish_outbox", started)
+
+async def get_outbox_depth():
+    """Число уведомлений в очереди по статусам: {status: count}."""
+    return dict(await _fetchall(SELECT_OUTBOX_DEPTH))
+
+def pending_writes():
+    """Сколько изменений ждёт записи в буфере отложенной записи."""
+    return len(_write_buffer)
+
+async def recover_outbox(worker_id, now):
+    """Возвращает в очередь незавершённые отправки остановившихся процессов. Возвращает их число."""
+    async with write_transaction() as db:
+        cursor = await db.execute(RECOVER_OUTBOX, (worker_id, now))
+    return cursor.rowcount
+
+async def reschedule_users(schedule):
+    """Сохраняет новое время уведомления: schedule — список пар (next_notify_at, user_id)."""
+    await _write_buffer.flush()
+    async with write_transaction() as db:
+        await db.executemany(UPDATE_NEXT_NOTIFY_AT, schedule)
+
+async def reload_blocked():
+    """Перечитывает список заблокировавших бота: его могли изменить другие процессы."""
+    await _write_buffer.flush()
+    rows = await _fetchall(SELECT_BLOCKED_IDS)
+    _blocked.clear()
+    _blocked.update(row[0] for row in rows)
+
+def blocked_ids():
+    """Множество заблокировавших бота (данные в памяти, изменять нельзя)."""
+    return _blocked
+
+def is_blocked(user_id):
+    """Заблокировал ли пользователь бота (по данным в памяти)."""
+    return user_id in _blocked
+
+async def mark_blocked(user_id, blocked_at=None):
+    """Отмечает, что пользователь заблокировал бота. Возвращает False, если это уже было известно."""
+    if user_id in _blocked:
+        return False
+    _blocked.add(user_id)
+    await _write_buffer.add_block(user_id, blocked_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return True
+
+async def mark_unblocked(user_id):
+    """
+    Отмечает, что пользователь снова доступен. Возвращает False, если этот процесс не знал о блокировке.
+
+    Запись в базе удаляется в любом случае: блокировку мог отметить другой процесс
+    (например, при неудачной отправке), и его запись в _blocked этого процесса не попала.
+    """
+    known = user_id in _blocked
+    _blocked.discard(user_id)
+    await _write_buffer.add_block(user_id, None)
+    return known
+
+async def get_blocked_page(after_at, after_id, limit):
+    """
+    Страница заблокировавших бота вместе с их данными, по порядку блокировки.
+
+    after_at и after_id — blocked_at и user_id последней записи предыдущей страницы
+    ("" и 0 — с начала). Курсор не зависит от того, остался ли тот пользователь
+    в списке, поэтому разблокировка во время перебора не возвращает его к началу.
+    """
+    await _write_buffer.flush()
+    return [BlockedUser(*row) for row in await _fetchall(SELECT_BLOCKED_PAGE, (after_at, after_id, limit))]
+
+async def iter_blocked_users(batch_size: int = DB_BATCH_SIZE):
+    """Перебирает всех заблокировавших бота порциями по batch_size."""
+    after_at, after_id = "", 0
+    while True:
+        page = await get_blocked_page(after_at, after_id, batch_size)
+        for user in page:
+            yield user
+        if len(page) < batch_size:
+            return
+        after_at, after_id = page[-1].blocked_at, page[-1].user_id
+
+async def count_blocked():
+    """Число заблокировавших бота."""
+    await _write_buffer.flush()
+    return (await _fetchone(COUNT_BLOCKED))[0]
+
+async def get_stale_users(checked_before, limit):
+    """Пользователи, блокировку которых не проверяли с checked_before (unix-время); сначала не проверенные ни разу."""
+    user_ids = [row[0] for row in await _fetchall(SELECT_UNCHECKED_USERS, (limit,))]
+    if len(user_ids) < limit:
+        rows = await _fetchall(SELECT_STALE_USERS, (checked_before, limit - len(user_ids)))
+        user_ids.extend(row[0] for row in rows)
+    return user_ids
+
+async def set_block_checked(user_ids, checked_at):
+    """Запоминает время проверки блокировки для списка пользователей."""
+    async with write_transaction() as db:
+        await db.executemany(UPDATE_BLOCK_CHECKED_AT, [(checked_at, user_id) for user_id in user_ids])
+
+async def get_fsm_record(key, now):
+    """Состояние и данные диалога (data — строка JSON) или None, если записи нет или она просрочена."""
+    return await _fetchone(SELECT_FSM_RECORD, (key, now))
+
+async def set_fsm_state(key, state, expires_at):
+    async with write_transaction() as db:
+        await db.execute(UPSERT_FSM_STATE, (key, state, expires_at))
+        await db.execute(DELETE_EMPTY_FSM_RECORD, (key,))
+
+async def set_fsm_data(key, data, expires_at):
+    async with write_transaction() as db:
+        await db.execute(UPSERT_FSM_DATA, (key, data, expires_at))
+        await db.execute(DELETE_EMPTY_FSM_RECORD, (key,))
+
+async def delete_expired_fsm_records(now):
+    """Удаляет брошенные диалоги и возвращает их число."""
+    async with write_transaction() as db:
+        cursor = await db.execute(DELETE_EXPIRED_FSM_RECORDS, (now,))
+    return cursor.rowcount
+
+async def register_worker(worker_id, expires_at, now):
+    """
+    Отмечает процесс живым до expires_at и возвращает всех живых процессов.
+
+    По их числу каждый процесс считает свою долю частей, поэтому новый процесс
+    получает работу, даже пока не держит ни одной аренды.
+    """
+    async with write_transaction() as db:
+        await db.execute(UPSERT_WORKER, (worker_id, expires_at))
+        await db.execute(DELETE_EXPIRED_WORKERS, (now,))
+    return {row[0] for row in await _fetchall(SELECT_WORKERS, (now,))}
+
+async def unregister_worker(worker_id):
+    async with write_transaction() as db:
+        await db.execute(DELETE_WORKER, (worker_id,))
+
+async def get_leases(now):
+    """Действующие аренды частей пользователей: словарь {shard: owner}."""
+    return dict(await _fetchall(SELECT_LEASES, (now,)))
+
+async def acquire_leases(shards, owner, expires_at, now):
+    """Берёт или продлевает аренду частей shards. Возвращает множество полученных частей."""
+    acquired = set()
+    async with write_transaction() as db:
+        for shard in shards:
+            cursor = await db.execute(ACQUIRE_LEASE, (shard, owner, expires_at, now))
+            if cursor.rowcount:
+                acquired.add(shard)
+    return acquired
+
+async def release_leases(shards, owner):
+    """Отдаёт аренду частей shards, чтобы их сразу могли забрать другие процессы."""
+    async with write_transaction() as db:
+        await db.executemany(RELEASE_LEASE, [(shard, owner) for shard in shards])
@@ -0,0 +1,28 @@
+"""
+Работа с файлами без блокировки цикла событий.
+
+Все обращения к диску идут через небольшой пул потоков (FILE_IO_WORKERS), а не через
+пул по умолчанию: медленный диск займёт не больше FILE_IO_WORKERS потоков и не отнимет
+их у других задач. Тот же пул подходит и для другой блокирующей работы (run).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from config import FILE_IO_WORKERS
+
+_executor = ThreadPoolExecutor(max_workers=FILE_IO_WORKERS, thread_name_prefix="file-io")
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет блокирующую функцию в пуле файловых операций."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+def _read_text(path: str, encoding: str) -> str:
+    with open(path, "r", encoding=encoding) as file:
+        return file.read()
+
+
+async def read_text(path: str, encoding: str = "utf-8") -> str:
+    """Содержимое текстового файла. FileNotFoundError, если файла нет."""
+    return await run(_read_text, path, encoding)
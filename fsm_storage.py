@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import time
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from cache import LRUCache
+from config import FSM_STORAGE, FSM_TTL, FSM_MAX_ENTRIES, FSM_SWEEP_INTERVAL
+import database
+
+logger = logging.getLogger(__name__)
+
+
+def _state_name(state):
+    return state.state if isinstance(state, State) else state
+
+
+class TTLMemoryStorage(BaseStorage):
+    """
+    Хранилище состояний диалога в памяти.
+
+    В отличие от MemoryStorage из aiogram, записей не больше max_entries (вытесняются давно
+    не активные), а незаконченный диалог забывается через ttl секунд после последнего шага.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL, max_entries: int = FSM_MAX_ENTRIES):
+        self._records = LRUCache(max_entries, ttl)  # StorageKey -> (state, data)
+
+    async def set_state(self, key: StorageKey, state=None):
+        _, data = self._records.get(key, (None, {}))
+        self._save(key, _state_name(state), data)
+
+    async def get_state(self, key: StorageKey):
+        return self._records.get(key, (None, {}))[0]
+
+    async def set_data(self, key: StorageKey, data):
+        state, _ = self._records.get(key, (None, {}))
+        self._save(key, state, dict(data))
+
+    async def get_data(self, key: StorageKey):
+        return dict(self._records.get(key, (None, {}))[1])
+
+    def _save(self, key, state, data):
+        if state is None and not data:
+            self._records.pop(key)
+        else:
+            self._records.set(key, (state, data))
+
+    async def sweep(self) -> int:
+        return self._records.purge_expired()
+
+    def stats(self) -> dict:
+        return self._records.stats()
+
+    async def close(self):
+        self._records.clear()
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний диалога в таблице fsm_states базы бота.
+
+    Незаконченная регистрация переживает перезапуск и видна всем процессам, работающим
+    с той же базой. Запись живёт ttl секунд после последнего шага.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id}:{key.business_connection_id}:{key.destiny}"
+
+    async def set_state(self, key: StorageKey, state=None):
+        await database.set_fsm_state(self._key(key), _state_name(state), time.time() + self.ttl)
+
+    async def get_state(self, key: StorageKey):
+        record = await database.get_fsm_record(self._key(key), time.time())
+        return record[0] if record else None
+
+    async def set_data(self, key: StorageKey, data):
+        await database.set_fsm_data(self._key(key), json.dumps(dict(data), ensure_ascii=False), time.time() + self.ttl)
+
+    async def get_data(self, key: StorageKey):
+        record = await database.get_fsm_record(self._key(key), time.time())
+        return json.loads(record[1]) if record else {}
+
+    async def sweep(self) -> int:
+        return await database.delete_expired_fsm_records(time.time())
+
+    async def close(self):
+        pass
+
+
+def create_storage() -> BaseStorage:
+    """Хранилище, выбранное в настройке FSM_STORAGE (memory или sqlite)."""
+    if FSM_STORAGE == "sqlite":
+        return SQLiteStorage()
+    return TTLMemoryStorage()
+
+
+async def sweep_storage(storage, interval: float = FSM_SWEEP_INTERVAL):
+    """Периодически удаляет брошенные диалоги."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            removed = await storage.sweep()
+            if removed:
+                logger.info(f"Удалено брошенных диалогов: {removed}")
+        except Exception as e:
+            logger.error(f"Ошибка при очистке состояний диалогов: {e}")
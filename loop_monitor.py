@@ -0,0 +1,41 @@
+"""
+Контроль задержки цикла событий.
+
+Задача засыпает на LOOP_LAG_INTERVAL и смотрит, насколько позже срока проснулась: это время
+цикл был занят чужим синхронным кодом (чтение файла, тяжёлый расчёт). Задержка попадает
+в метрику bot_loop_lag_seconds, а если она больше LOOP_LAG_WARN, в лог пишется предупреждение.
+"""
+import asyncio
+import logging
+import time
+from config import LOOP_LAG_INTERVAL, LOOP_LAG_WARN
+from metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = histogram(
+    "bot_loop_lag_seconds", "Опоздание цикла событий",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, warn: float = LOOP_LAG_WARN):
+        self.interval = interval
+        self.warn = warn
+        self.max_lag = 0.0  # Наибольшая задержка с последнего reset()
+
+    def reset(self) -> float:
+        """Возвращает наибольшую задержку и начинает считать заново."""
+        max_lag, self.max_lag = self.max_lag, 0.0
+        return max_lag
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            LOOP_LAG_SECONDS.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn:
+                logger.warning(f"Цикл событий был занят {lag * 1000:.0f} мс")
@@ -0,0 +1,204 @@
+"""
+Метрики бота в текстовом формате Prometheus.
+
+Счётчики и гистограммы копятся в памяти процесса; render() собирает их в текст, который
+отдаётся по адресу http://METRICS_HOST:METRICS_PORT/metrics (если порт задан) и админской
+командой /метрики. При METRICS_ENABLED=0 (по умолчанию) вместо метрик создаются заглушки
+с пустыми методами, и в горячих местах остаётся только пустой вызов.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from aiogram import BaseMiddleware
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+
+# Границы корзин гистограмм задержек, сек
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}  # значения меток -> число
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # значения меток -> [счётчики по корзинам (последняя — +Inf), сумма, количество]
+
+    def observe(self, value: float, *labels):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Значение, которое считается в момент запроса метрик: callback (функция или корутина)
+    возвращает число или словарь {значение метки или кортеж значений: число}."""
+
+    def __init__(self, name: str, documentation: str, callback, labelnames=(), kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = labelnames
+        self.kind = kind
+
+    async def collect(self) -> list:
+        values = self.callback()
+        if asyncio.iscoroutine(values):
+            values = await values
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class _Noop:
+    def inc(self, *labels, amount: float = 1):
+        pass
+
+    def observe(self, value: float, *labels):
+        pass
+
+
+_NOOP = _Noop()
+
+
+def counter(name: str, documentation: str, labelnames=()):
+    if not METRICS_ENABLED:
+        return _NOOP
+    metric = Counter(name, documentation, labelnames)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+    if not METRICS_ENABLED:
+        return _NOOP
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def gauge(name: str, documentation: str, callback, labelnames=(), kind: str = "gauge"):
+    """Регистрирует значение, вычисляемое при каждом запросе метрик (kind="counter" для накопительных)."""
+    if METRICS_ENABLED:
+        _registry.append(Gauge(name, documentation, callback, labelnames, kind))
+
+
+async def render() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in _registry:
+        lines.extend(await metric.collect() if isinstance(metric, Gauge) else metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Метрики, которые пишут модули бота
+HANDLER_SECONDS = histogram("bot_handler_seconds", "Время обработки события", ("handler",))
+HANDLER_ERRORS = counter("bot_handler_errors_total", "Ошибки в обработчиках по типу", ("handler", "error"))
+DB_QUERY_SECONDS = histogram("bot_db_query_seconds", "Время запросов к базе", ("query",))
+SEND_SECONDS = histogram("bot_send_seconds", "Время отправки одного сообщения")
+SENT_MESSAGES = counter("bot_sent_messages_total", "Отправленные сообщения")
+SEND_ERRORS = counter("bot_send_errors_total", "Ошибки отправки по типу", ("error",))
+THROTTLED = counter("bot_throttled_total", "Отброшенные сообщения: rate — превышен лимит, duplicate — повтор", ("reason",))
+
+
+def cache_gauges(caches: dict):
+    """Метрики кэшей LRUCache: caches — словарь {имя: объект со stats()}."""
+    def stat(key):
+        return lambda: {(name, ): cache.stats()[key] for name, cache in caches.items()}
+
+    gauge("bot_cache_hits_total", "Попадания в кэш", stat("hits"), ("cache",), kind="counter")
+    gauge("bot_cache_misses_total", "Промахи кэша", stat("misses"), ("cache",), kind="counter")
+    gauge("bot_cache_evictions_total", "Вытеснения из кэша", stat("evictions"), ("cache",), kind="counter")
+    gauge("bot_cache_size", "Записей в кэше", stat("size"), ("cache",))
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время и ошибки обработчиков aiogram; для MessageRouter метка — имя найденного обработчика."""
+
+    async def __call__(self, handler, event, data):
+        route = data.get("route") or data.get("handler")
+        name = getattr(getattr(route, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+
+def setup_dispatcher(dp):
+    """Подключает замер обработчиков, если метрики включены."""
+    if METRICS_ENABLED:
+        middleware = HandlerMetricsMiddleware()
+        dp.message.middleware(middleware)
+        dp.my_chat_member.middleware(middleware)
+        dp.callback_query.middleware(middleware)
+
+
+async def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Отдаёт метрики по HTTP на /metrics. Возвращает AppRunner или None, если метрики выключены."""
+    if not METRICS_ENABLED or not port:
+        return None
+    from aiohttp import web  # Серверная часть aiohttp нужна только здесь
+
+    async def handle(request):
+        return web.Response(text=await render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from aiogram import Bot
+from config import (
+    BROADCAST_RATE, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX,
+)
+from database import (
+    claim_outbox, finish_outbox, recover_outbox, get_next_outbox_attempt,
+    is_blocked, mark_blocked, set_block_checked,
+)
+from broadcast import broadcast, send_limiter
+from sharding import ShardLeases
+
+logger = logging.getLogger(__name__)
+
+_wakeup = asyncio.Event()
+
+
+def wake():
+    """Сообщает доставке, что в очереди появились новые уведомления."""
+    _wakeup.set()
+
+
+def retry_delay(attempts: int) -> float:
+    """Пауза перед следующей попыткой после attempts неудачных: удваивается с каждой неудачей."""
+    return min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+
+
+async def deliver_batch(bot: Bot, batch):
+    """
+    Отправляет порцию уведомлений из очереди через общий ограничитель send_limiter
+    и записывает итог: batch — строки из claim_outbox.
+    """
+    sent, blocked = set(), set()
+
+    async def on_sent(user_id):
+        sent.add(user_id)
+
+    async def on_blocked(user_id):
+        # Пользователь заблокировал бота
+        blocked.add(user_id)
+        if await mark_blocked(user_id):
+            logger.warning(f"Пользователь {user_id} заблокировал бота. Добавлен в список заблокированных.")
+
+    messages = [(user_id, text) for _, user_id, text, _ in batch if not is_blocked(user_id)]
+    interrupted = False
+    try:
+        await broadcast(bot, messages, limiter=send_limiter, on_sent=on_sent, on_blocked=on_blocked)
+    except asyncio.CancelledError:
+        interrupted = True
+        raise
+    finally:
+        now = time.time()
+        done, retries = [], []
+        for outbox_id, user_id, _, attempts in batch:
+            if user_id in sent or user_id in blocked or is_blocked(user_id):
+                done.append(outbox_id)
+            elif interrupted:
+                # Процесс останавливается: это не неудачная попытка
+                retries.append(("pending", attempts, now, outbox_id))
+            elif attempts + 1 >= OUTBOX_MAX_ATTEMPTS:
+                logger.error(f"Уведомление пользователю {user_id} не отправлено после {attempts + 1} попыток.")
+                retries.append(("dead", attempts + 1, now, outbox_id))
+            else:
+                retries.append(("pending", attempts + 1, now + retry_delay(attempts + 1), outbox_id))
+        await finish_outbox(done, retries)
+        # Успешная доставка заодно подтверждает, что пользователь не заблокировал бота
+        await set_block_checked(sent, int(now))
+
+
+async def deliver(bot: Bot, leases: ShardLeases):
+    """
+    Доставка уведомлений из очереди (таблица outbox).
+
+    Планировщик только ставит уведомления в очередь, а отправляет их этот цикл: забирает
+    порции из своих частей пользователей, неудачные отправки повторяет с растущей паузой,
+    а после OUTBOX_MAX_ATTEMPTS неудач оставляет уведомление в очереди со статусом dead.
+    Незавершённые отправки после перезапуска или смерти процесса возвращаются в очередь,
+    поэтому работа не теряется.
+
+    Ограничение Telegram общее для всего бота, поэтому BROADCAST_RATE делится поровну
+    между живыми процессами.
+    """
+    while True:
+        _wakeup.clear()
+        delay = OUTBOX_POLL_INTERVAL
+        try:
+            shards = leases.owned()
+            if not shards:
+                delay = leases.renew_interval
+            else:
+                batch = await claim_outbox(
+                    time.time(), OUTBOX_BATCH_SIZE, leases.worker_id, shards, leases.shard_count
+                )
+                if batch:
+                    send_limiter.set_rate(BROADCAST_RATE / leases.workers)
+                    await deliver_batch(bot, batch)
+                    continue
+
+                recovered = await recover_outbox(leases.worker_id, time.time())
+                if recovered:
+                    logger.info(f"Возвращено в очередь незавершённых отправок: {recovered}")
+                    continue
+                next_at = await get_next_outbox_attempt(shards, leases.shard_count)
+                if next_at is not None:
+                    delay = min(OUTBOX_POLL_INTERVAL, max(0.0, next_at - time.time()))
+        except Exception as e:
+            logger.error(f"Ошибка при доставке уведомлений: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
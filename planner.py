@@ -0,0 +1,38 @@
+"""
+Планирование еженедельной рассылки.
+
+Отбор получателей отделён от отправки: plan_week за один проход по выборке считает
+прожитые недели по номерам дней (без datetime), отбрасывает тех, кому уведомлять
+не нужно, и отмечает круглые даты. Результат — очередь доставки для рассылки.
+"""
+from typing import NamedTuple
+from config import NOTIFY_MILESTONE_WEEKS
+from database import UserRecord
+
+
+class Delivery(NamedTuple):
+    """Одно уведомление в очереди доставки."""
+    user: UserRecord
+    weeks_lived: int
+    milestone: bool  # Круглая дата: число недель кратно NOTIFY_MILESTONE_WEEKS (0 — круглых дат нет)
+
+
+def plan_week(users, today: int, blocked=frozenset(), milestone: int = NOTIFY_MILESTONE_WEEKS) -> list:
+    """
+    Очередь доставки для пользователей users (список UserRecord).
+
+    today — сегодняшняя дата как date.toordinal(), blocked — множество заблокировавших бота.
+    Пропускаются заблокировавшие, пользователи с некорректной датой (birth_ordinal is None)
+    и те, кому уведомление за текущую неделю уже отправлено. milestone <= 0 отключает круглые даты.
+    """
+    plan = []
+    append = plan.append
+    for user in users:
+        birth_ordinal = user.birth_ordinal
+        if birth_ordinal is None or user.user_id in blocked:
+            continue
+        weeks_lived = (today - birth_ordinal) // 7
+        last_week = user.last_notified_week
+        if last_week is None or weeks_lived > last_week:
+            append(Delivery(user, weeks_lived, milestone > 0 and weeks_lived > 0 and weeks_lived % milestone == 0))
+    return plan
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from config import QUOTES_PATH, QUOTES_CHECK_INTERVAL, QUOTES_ROTATION_USERS
+import fileio
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteStore:
+    """
+    Цитаты, загруженные в память один раз.
+
+    Файл перечитывается (в пуле файловых операций, не блокируя бота) только когда меняется его mtime;
+    mtime проверяется не чаще раза в QUOTES_CHECK_INTERVAL секунд.
+
+    Чтобы цитаты у пользователя не повторялись, пока не закончатся все, для него хранится
+    не копия списка, а три числа: начало, шаг и номер. Индекс i-й цитаты — (start + i * step) % n,
+    и при шаге, взаимно простом с n, такая последовательность обходит все цитаты ровно по разу.
+    """
+
+    def __init__(self, path: str = QUOTES_PATH, check_interval: float = QUOTES_CHECK_INTERVAL,
+                 max_rotations: int = QUOTES_ROTATION_USERS):
+        self.path = path
+        self.check_interval = check_interval
+        self.max_rotations = max_rotations
+        self.quotes = []
+        self._mtime = None
+        self._checked_at = 0.0
+        self._rotations = {}  # user_id -> (start, step, position)
+        self._lock = asyncio.Lock()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        if mtime == self._mtime:
+            return None
+        with open(self.path, "r", encoding="utf-8") as file:
+            quotes = [line.strip() for line in file if line.strip()]
+        return mtime, quotes
+
+    def _is_stale(self, force: bool) -> bool:
+        # Пока цитат нет, проверяем файл при каждом запросе
+        return force or not self.quotes or time.monotonic() - self._checked_at >= self.check_interval
+
+    async def refresh(self, force: bool = False):
+        """Перечитывает файл, если он изменился. FileNotFoundError, если файла нет."""
+        if not self._is_stale(force):
+            return
+        async with self._lock:
+            if not self._is_stale(force):
+                return
+            self._checked_at = time.monotonic()
+            try:
+                loaded = await fileio.run(self._load)
+            except FileNotFoundError:
+                if not self.quotes:
+                    raise
+                logger.warning(f"Файл {self.path} не найден, используем загруженные ранее цитаты.")
+                return
+            if loaded is not None:
+                self._mtime, self.quotes = loaded
+                self._rotations.clear()
+                logger.info(f"Загружено цитат: {len(self.quotes)}")
+
+    def _next_index(self, user_id) -> int:
+        n = len(self.quotes)
+        rotation = self._rotations.pop(user_id, None)
+        if rotation is None or rotation[2] >= n:
+            # Новый круг: случайное начало и случайный шаг, взаимно простой с n
+            step = random.randrange(1, n) if n > 1 else 1
+            while math.gcd(step, n) != 1:
+                step = random.randrange(1, n)
+            rotation = (random.randrange(n), step, 0)
+        start, step, position = rotation
+        # Переставляем пользователя в конец словаря, чтобы вытеснять давно не заходивших
+        self._rotations[user_id] = (start, step, position + 1)
+        if len(self._rotations) > self.max_rotations:
+            del self._rotations[next(iter(self._rotations))]
+        return (start + position * step) % n
+
+    async def get_random_quote(self, user_id=None):
+        """Случайная цитата (без повторов для user_id) или None, если цитат нет."""
+        await self.refresh()
+        if not self.quotes:
+            return None
+        if user_id is None:
+            return random.choice(self.quotes)
+        return self.quotes[self._next_index(user_id)]
+
+
+quote_store = QuoteStore()
@@ -0,0 +1,57 @@
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.fsm.state import State
+from aiogram.types import Message
+
+
+class MessageRouter:
+    """
+    Первая ступень маршрутизации сообщений.
+
+    Вместо цепочки фильтров, которые aiogram проверяет по очереди для каждого сообщения,
+    состояние диалога и текст кнопки ищутся в словарях — одна проверка по хэшу,
+    сколько бы кнопок и состояний ни было. Состояние диалога важнее кнопки:
+    если пользователь вводит имя, нажатие кнопки считается вводом.
+
+    Команды (текст с «/») сюда не попадают и обрабатываются обычными фильтрами aiogram,
+    как и всё, что роутер не узнал.
+
+    Регистрируется одним обработчиком в начале цепочки:
+        router = MessageRouter()
+        dp.message.register(router.handle, router.match)
+    """
+
+    def __init__(self):
+        self.buttons = {}  # текст кнопки -> обработчик
+        self.states = {}  # имя состояния -> обработчик
+
+    def button(self, text: str):
+        """Декоратор: обработчик нажатия кнопки с текстом text."""
+        def decorator(callback):
+            self.buttons[text] = CallableObject(callback)
+            return callback
+        return decorator
+
+    def state(self, state: State):
+        """Декоратор: обработчик сообщений в состоянии диалога state."""
+        def decorator(callback):
+            self.states[state.state] = CallableObject(callback)
+            return callback
+        return decorator
+
+    def resolve(self, text, raw_state):
+        """Обработчик для сообщения или None."""
+        if text is not None and text.startswith("/"):
+            return None
+        if raw_state is not None:
+            route = self.states.get(raw_state)
+            if route is not None:
+                return route
+        return self.buttons.get(text)
+
+    async def match(self, message: Message, raw_state: str = None):
+        """Фильтр aiogram: найденный обработчик передаётся в handle через аргумент route."""
+        route = self.resolve(message.text, raw_state)
+        return {"route": route} if route is not None else False
+
+    async def handle(self, message: Message, route: CallableObject, **kwargs):
+        return await route.call(message, **kwargs)
@@ -1,98 +1,148 @@
 import asyncio
-from datetime import datetime
+import time
 from aiogram import Bot
-from aiogram.exceptions import TelegramForbiddenError
-from database import get_all_users, update_last_notified_week
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from config import (
+    SCHEDULER_BATCH_SIZE, SCHEDULER_MAX_SLEEP,
+    BLOCK_SWEEP_STALE_DAYS, BLOCK_SWEEP_BATCH, BLOCK_SWEEP_INTERVAL, BLOCK_SWEEP_RATE,
+    LEASE_RENEW_INTERVAL,
+)
+from database import (
+    get_next_notify_at, get_due_users, reschedule_users, enqueue_notifications,
+    is_blocked, blocked_ids, mark_blocked, reload_blocked, get_stale_users, set_block_checked,
+)
+from sharding import ShardLeases
+from utils import next_notify_at, now
+from broadcast import TokenBucket
+from outbox import wake
+from planner import plan_week
+from texts import weekly_message
 import logging
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", encoding="utf-8")
 logger = logging.getLogger(__name__)
 
-async def load_blocked_users():
-    """Загружает список заблокированных пользователей из файла."""
-    blocked_users = {}
-    try:
-        with open("blocked_users.txt", "r") as f:
-            for line in f.readlines():
-                try:
-                    user_id, block_time = line.strip().split(":")
-                    blocked_users[int(user_id)] = block_time
-                except ValueError:
-                    logger.warning(f"Некорректная строка в файле blocked_users.txt: {line.strip()}")
-                    continue
-    except FileNotFoundError:
-        logger.info("Файл blocked_users.txt не найден. Создаем новый.")
-    return blocked_users
+async def check_blocked_users(bot: Bot, leases: ShardLeases):
+    """
+    Фоновая перепроверка блокировок.
 
-async def save_blocked_users(blocked_users):
-    """Сохраняет список заблокированных пользователей в файл."""
-    with open("blocked_users.txt", "w") as f:
-        for user_id, block_time in blocked_users.items():
-            f.write(f"{user_id}:{block_time}\n")
+    Блокировки и разблокировки приходят событиями my_chat_member, а ошибки отправки
+    отмечаются при рассылке. Здесь перепроверяются только пользователи, о которых
+    ничего не было слышно BLOCK_SWEEP_STALE_DAYS дней, небольшими порциями и со своим
+    лимитом запросов, чтобы не отнимать лимит у настоящих сообщений.
 
-async def check_blocked_users(bot: Bot):
-    """Проверяет статус пользователей и обновляет список заблокированных."""
+    Лимит общий для всего бота, поэтому перепроверку ведёт только процесс, владеющий частью 0.
+    """
+    limiter = TokenBucket(BLOCK_SWEEP_RATE)
     while True:
-        users = await get_all_users()
-        blocked_users = await load_blocked_users()
-
-        for user_id, name, birthdate, last_week, username in users:
-            try:
-                # Проверяем статус пользователя
-                await bot.get_chat(user_id)
-                
-                # Если пользователь был заблокирован, но теперь разблокировал бота
-                if user_id in blocked_users:
-                    del blocked_users[user_id]
-                    logger.info(f"Пользователь {user_id} разблокировал бота. Удален из списка заблокированных.")
-            except TelegramForbiddenError:
-                # Пользователь заблокировал бота
-                if user_id not in blocked_users:
-                    block_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    blocked_users[user_id] = block_time
-                    logger.warning(f"Пользователь {user_id} заблокировал бота. Добавлен в список заблокированных.")
-            except Exception as e:
-                logger.error(f"Ошибка при проверке блокировки пользователя {user_id}: {e}")
-
-        # Сохраняем обновленный список заблокированных пользователей
-        await save_blocked_users(blocked_users)
-        
-        logger.info("Файл blocked_users.txt успешно обновлен.")
-        await asyncio.sleep(86400)  # Проверяем раз в день
-
-async def send_weekly_notifications(bot: Bot):
-    """Отправляет уведомления о прожитых неделях."""
-    try:
-        users = await get_all_users()
-        for user_id, name, birthdate, last_week, username in users:
-            try:
-                # Пытаемся преобразовать дату из формата DD.MM.YYYY
-                birthdate_dt = datetime.strptime(birthdate, "%d.%m.%Y")
-            except ValueError:
-                # Если дата уже в формате YYYY-MM-DD, преобразуем её
-                birthdate_dt = datetime.strptime(birthdate, "%Y-%m-%d")
-            
-            weeks_lived = (datetime.now().date() - birthdate_dt.date()).days // 7
-            if last_week is None or weeks_lived > last_week:
-                message = f"Привет, {name}! Ты прожил {weeks_lived} недель. Продолжай жить на максимум! 🚀"
+        if 0 not in leases.owned():
+            await asyncio.sleep(leases.renew_interval)
+            continue
+        user_ids = []
+        try:
+            checked_before = int(time.time()) - BLOCK_SWEEP_STALE_DAYS * 24 * 60 * 60
+            user_ids = await get_stale_users(checked_before, BLOCK_SWEEP_BATCH)
+            checked = []
+            for user_id in user_ids:
+                if is_blocked(user_id):
+                    checked.append(user_id)  # Разблокировку сообщит событие my_chat_member
+                    continue
+                await limiter.acquire()
                 try:
-                    await bot.send_message(user_id, message)
-                    await update_last_notified_week(user_id, weeks_lived)
+                    # Проверяем статус пользователя
+                    await bot.get_chat(user_id)
+                    checked.append(user_id)
                 except TelegramForbiddenError:
                     # Пользователь заблокировал бота
-                    blocked_users = await load_blocked_users()
-                    if user_id not in blocked_users:
-                        blocked_users[user_id] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        await save_blocked_users(blocked_users)
+                    checked.append(user_id)
+                    if await mark_blocked(user_id):
                         logger.warning(f"Пользователь {user_id} заблокировал бота. Добавлен в список заблокированных.")
+                except TelegramRetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
                 except Exception as e:
-                    logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке уведомлений: {e}")
+                    logger.error(f"Ошибка при проверке блокировки пользователя {user_id}: {e}")
+            await set_block_checked(checked, int(time.time()))
+            if checked:
+                logger.info(f"Проверена блокировка у {len(checked)} пользователей.")
+        except Exception as e:
+            logger.error(f"Ошибка при перепроверке блокировок: {e}")
+
+        # Если давно не проверенных пользователей больше, чем помещается в порцию, продолжаем сразу
+        if len(user_ids) < BLOCK_SWEEP_BATCH:
+            await asyncio.sleep(BLOCK_SWEEP_INTERVAL)
+
+async def enqueue_weekly_notifications(users):
+    """
+    Ставит в очередь уведомления о прожитых неделях пользователям из списка users.
+
+    Отправляет их outbox.deliver. Неделя отмечается в базе вместе с постановкой в очередь,
+    поэтому пользователя, выбранного двумя процессами, уведомит только один из них.
+    """
+    plan = plan_week(users, now().date().toordinal(), blocked_ids())
+    entries = [
+        (user.user_id, weeks_lived, weekly_message(user.name, weeks_lived, milestone))
+        for user, weeks_lived, milestone in plan
+    ]
+    queued = await enqueue_notifications(entries, time.time())
+    if queued:
+        logger.info(f"Поставлено в очередь уведомлений: {queued}")
+        wake()
+
+async def process_due(now_ts, shards=(0,), shard_count=1) -> int:
+    """Одна порция планировщика: ставит в очередь уведомления тем, кому пора, и переносит их
+    на следующую неделю. Возвращает число обработанных пользователей."""
+    users = await get_due_users(now_ts, SCHEDULER_BATCH_SIZE, shards, shard_count)
+    await enqueue_weekly_notifications(users)
+
+    # Переносим уведомление на следующую неделю
+    schedule = []
+    for user in users:
+        if user.birth_ordinal is None:
+            # Некорректная дата: больше не планируем
+            logger.warning(f"Некорректная дата рождения у пользователя {user.user_id}")
+            notify_at = None
+        else:
+            notify_at = next_notify_at(user.birth_ordinal)
+        schedule.append((notify_at, user.user_id))
+    await reschedule_users(schedule)
+    return len(users)
+
+async def scheduler(leases: ShardLeases):
+    """
+    Планировщик уведомлений.
+
+    Время следующего уведомления каждого пользователя хранится в базе (next_notify_at),
+    поэтому после перезапуска расписание не теряется, а нагрузка распределена по дням недели.
+    Обслуживаются только пользователи из частей, аренду которых держит этот процесс.
+    """
+    while True:
+        now_ts = int(time.time())
+        try:
+            shards = leases.owned()
+            if not shards:
+                # Аренда ещё не получена или все части у других процессов
+                await asyncio.sleep(leases.renew_interval)
+                continue
+            next_at = await get_next_notify_at(shards, leases.shard_count)
+            if next_at is None or next_at > now_ts:
+                delay = SCHEDULER_MAX_SLEEP if next_at is None else min(SCHEDULER_MAX_SLEEP, next_at - now_ts)
+                await asyncio.sleep(delay)
+                continue
+
+            await process_due(now_ts, shards, leases.shard_count)
+        except Exception as e:
+            logger.error(f"Ошибка в планировщике уведомлений: {e}")
+            await asyncio.sleep(SCHEDULER_MAX_SLEEP)
+
+async def sync_blocked(interval: float = LEASE_RENEW_INTERVAL):
+    """
+    Периодически перечитывает список заблокировавших бота.
 
-async def scheduler(bot: Bot):
-    """Планировщик задач."""
+    Нужна процессам без приёма обновлений: события my_chat_member получает только
+    процесс бота, а разблокировку остальные иначе не увидят.
+    """
     while True:
-        await send_weekly_notifications(bot)
-        await asyncio.sleep(604800)  # Ждем неделю (7 дней * 24 часа * 60 мин * 60 сек)
+        await asyncio.sleep(interval)
+        try:
+            await reload_blocked()
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении списка заблокированных: {e}")
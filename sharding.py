@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import math
+import time
+from config import SHARD_COUNT, WORKER_ID, LEASE_TTL, LEASE_RENEW_INTERVAL
+import database
+
+logger = logging.getLogger(__name__)
+
+
+class ShardLeases:
+    """
+    Аренды частей пользователей, которые обслуживает этот процесс.
+
+    Пользователи поделены на shard_count частей по user_id % shard_count. Аренда части
+    хранится в таблице scheduler_leases и действует ttl секунд; процесс продлевает свои
+    аренды каждые renew_interval секунд. Если процесс умер, его аренды истекают и их
+    забирают остальные. Живые процессы отмечаются в scheduler_workers; каждый держит
+    не больше своей доли частей, лишние отдаёт — так новые процессы получают работу
+    без перезапуска старых.
+
+    Даже если два процесса ненадолго считают одну часть своей, уведомление отправит только
+    один из них: неделя отмечается условным UPDATE (см. database.enqueue_notifications).
+    """
+
+    def __init__(self, worker_id: str = WORKER_ID, shard_count: int = SHARD_COUNT,
+                 ttl: float = LEASE_TTL, renew_interval: float = LEASE_RENEW_INTERVAL):
+        self.worker_id = worker_id
+        self.shard_count = shard_count
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.workers = 1  # Живых процессов при последнем продлении, включая этот
+        self._shards = frozenset()
+        self._valid_until = 0.0
+
+    def owned(self) -> frozenset:
+        """Части, аренда которых точно ещё действует."""
+        if time.time() >= self._valid_until:
+            return frozenset()
+        return self._shards
+
+    async def renew(self):
+        now = time.time()
+        workers = await database.register_worker(self.worker_id, now + self.ttl, now)
+        leases = await database.get_leases(now)
+        self.workers = len(workers | {self.worker_id})
+        share = math.ceil(self.shard_count / self.workers)
+
+        mine = sorted(shard for shard, owner in leases.items() if owner == self.worker_id)
+        free = [shard for shard in range(self.shard_count) if shard not in leases]
+        keep, extra = mine[:share], mine[share:]
+        wanted = keep + free[:max(0, share - len(keep))]
+
+        # Аренду берём до запроса, поэтому срок отсчитываем от его начала
+        shards = frozenset(await database.acquire_leases(wanted, self.worker_id, now + self.ttl, now))
+        if extra:
+            await database.release_leases(extra, self.worker_id)
+        if shards != self._shards:
+            logger.info(f"Процесс {self.worker_id} обслуживает части {sorted(shards)} из {self.shard_count}")
+        self._shards, self._valid_until = shards, now + self.ttl
+
+    async def release(self):
+        """Отдаёт все аренды (при остановке процесса)."""
+        shards, self._shards = self._shards, frozenset()
+        if shards:
+            await database.release_leases(shards, self.worker_id)
+        await database.unregister_worker(self.worker_id)
+
+    async def run(self):
+        while True:
+            try:
+                await self.renew()
+            except Exception as e:
+                logger.error(f"Ошибка при продлении аренды частей пользователей: {e}")
+            await asyncio.sleep(self.renew_interval)
@@ -0,0 +1,105 @@
+"""
+Тексты сообщений бота и склонение слова «неделя».
+
+Склонение зависит только от n % 100 и падежа, поэтому формы подсчитаны заранее
+в таблице из 200 строк, а готовые строки вида «21 неделю» запоминаются: число недель
+у пользователей лежит в пределах нескольких тысяч, и повторный вызов не создаёт
+новых объектов. Шаблоны сообщений — f-строки внутри функций: Python разбирает их
+один раз при компиляции модуля.
+"""
+from functools import lru_cache
+
+NOMINATIVE = "именительный"
+ACCUSATIVE = "винительный"
+
+# Числа от 1 до 9 словами
+NUMERALS = {
+    (1, NOMINATIVE): "одна", (1, ACCUSATIVE): "одну",
+    (2, NOMINATIVE): "две", (2, ACCUSATIVE): "две",
+    (3, NOMINATIVE): "три", (3, ACCUSATIVE): "три",
+    (4, NOMINATIVE): "четыре", (4, ACCUSATIVE): "четыре",
+    (5, NOMINATIVE): "пять", (5, ACCUSATIVE): "пять",
+    (6, NOMINATIVE): "шесть", (6, ACCUSATIVE): "шесть",
+    (7, NOMINATIVE): "семь", (7, ACCUSATIVE): "семь",
+    (8, NOMINATIVE): "восемь", (8, ACCUSATIVE): "восемь",
+    (9, NOMINATIVE): "девять", (9, ACCUSATIVE): "девять",
+}
+
+# Формы слова «неделя»: одна, две-четыре, пять и больше
+WEEK_FORMS = {
+    NOMINATIVE: ("неделя", "недели", "недель"),
+    ACCUSATIVE: ("неделю", "недели", "недель"),
+}
+
+
+def _plural_index(n: int) -> int:
+    if n % 10 == 1 and n % 100 != 11:
+        return 0
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return 1
+    return 2
+
+
+# Падеж -> формы слова «неделя» для n % 100 от 0 до 99
+WEEK_WORDS = {case: tuple(forms[_plural_index(n)] for n in range(100)) for case, forms in WEEK_FORMS.items()}
+
+
+@lru_cache(maxsize=16384)
+def weeks_text(weeks: int, case: str = NOMINATIVE, use_text: bool = False) -> str:
+    """«5 недель», «21 неделю» и т. п.; use_text — числа от 1 до 9 словами."""
+    if use_text and 1 <= weeks <= 9:
+        return f"{NUMERALS[weeks, case]} {WEEK_WORDS[case][weeks]}"
+    return f"{weeks} {WEEK_WORDS[case][weeks % 100]}"
+
+
+# Сообщения
+
+START_MESSAGE = "Здравствуйте! Я бот, который будет присылать вам уведомление о каждой прожитой неделе. Давайте познакомимся. Как вас зовут?"
+
+
+def welcome_back_message(name: str, weeks: int, birthdate: str) -> str:
+    return f"Привет, {name}! 👋 Вы прожили {weeks_text(weeks)}. Ваша дата рождения: {birthdate}."
+
+
+def registered_message(name: str, weeks: int) -> str:
+    return f"Отлично, {name}! 🎉 Вы прожили {weeks_text(weeks, ACCUSATIVE)}. Теперь я буду напоминать вам о каждой новой неделе!"
+
+
+def status_message(name: str, weeks: int, birthdate: str, fact: str) -> str:
+    return f"{name}, вы прожили {weeks_text(weeks, ACCUSATIVE, use_text=True)}. Ваша дата рождения: {birthdate}. 🎉\n\n{fact}"
+
+
+def weekly_message(name: str, weeks: int, milestone: bool = False) -> str:
+    if milestone:
+        return f"Привет, {name}! Сегодня круглая дата: ты прожил {weeks_text(weeks, ACCUSATIVE)}! 🎉 Продолжай жить на максимум! 🚀"
+    return f"Привет, {name}! Ты прожил {weeks_text(weeks, ACCUSATIVE)}. Продолжай жить на максимум! 🚀"
+
+
+# Факты для статуса
+
+def fact_next_rounded_age_message(weeks: int, age: int) -> str:
+    return f"Осталось {weeks_text(weeks)} до {age} лет!"
+
+
+def fact_adult_message(weeks: int) -> str:
+    return f"Осталось {weeks_text(weeks)} до совершеннолетия (18 лет)!"
+
+
+def fact_next_birthday_message(weeks: int) -> str:
+    return f"До следующего дня рождения осталось {weeks_text(weeks)}!"
+
+
+def fact_weeks_this_year_message(weeks: int) -> str:
+    return f"В этом году уже прошло {weeks_text(weeks)}!"
+
+
+def fact_new_year_message(weeks: int) -> str:
+    return f"До Нового года осталось {weeks_text(weeks)}!"
+
+
+def fact_lifespan_reached_message(lifespan: int) -> str:
+    return f"Вы уже достигли среднего возраста в мире ({lifespan} года)!"
+
+
+def fact_average_lifespan_message(weeks: int, lifespan: int) -> str:
+    return f"Осталось {weeks_text(weeks)} до среднего возраста в мире ({lifespan} года)!"
@@ -0,0 +1,87 @@
+"""
+Защита от слишком частых сообщений одного пользователя.
+
+ThrottlingMiddleware стоит перед фильтрами и обработчиками (outer middleware), поэтому
+лишнее сообщение отбрасывается за O(1): без обращения к базе, разбора состояния и ответа.
+У каждого пользователя своё ведро токенов; о превышении лимита пользователь узнаёт один
+раз, пока ведро не наполнится снова. Если такое же сообщение этого пользователя ещё
+обрабатывается (например, кнопку нажали несколько раз подряд), повтор отбрасывается —
+ответ придёт от первого.
+"""
+import time
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+from cache import LRUCache
+from config import THROTTLE_RATE, THROTTLE_BURST, THROTTLE_MAX_USERS
+from metrics import THROTTLED
+
+
+class UserRateLimiter:
+    """
+    Вёдра токенов по пользователям: не больше rate сообщений в секунду с запасом burst.
+
+    Вёдра хранятся в LRUCache и забываются через burst / rate секунд без сообщений —
+    к этому времени ведро всё равно было бы полным, поэтому память занимают только
+    активные пользователи.
+    """
+
+    def __init__(self, rate: float = THROTTLE_RATE, burst: int = THROTTLE_BURST, maxsize: int = THROTTLE_MAX_USERS):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets = LRUCache(maxsize, self.burst / rate)  # user_id -> [токены, время обновления, предупреждён]
+
+    def try_acquire(self, user_id: int) -> bool:
+        """Забирает токен, если он есть; не ждёт."""
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = [float(self.burst), now, False]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        allowed = bucket[0] >= 1
+        if allowed:
+            bucket[0] -= 1
+            bucket[2] = False
+        self._buckets.set(user_id, bucket)
+        return allowed
+
+    def warn_once(self, user_id: int) -> bool:
+        """True, если пользователя ещё не предупреждали с последнего разрешённого сообщения."""
+        bucket = self._buckets.get(user_id)
+        if bucket is None or bucket[2]:
+            return False
+        bucket[2] = True
+        return True
+
+    def stats(self) -> dict:
+        return self._buckets.stats()
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты и склейка одинаковых сообщений, которые ещё обрабатываются."""
+
+    def __init__(self, limiter: UserRateLimiter = None):
+        self.limiter = limiter or UserRateLimiter()
+        self._in_flight = set()  # (user_id, текст) сообщений в обработке
+
+    async def __call__(self, handler, event: Message, data):
+        user = event.from_user
+        if user is None:
+            return await handler(event, data)
+
+        if not self.limiter.try_acquire(user.id):
+            THROTTLED.inc("rate")
+            if self.limiter.warn_once(user.id):
+                await event.answer("Слишком много сообщений. Подождите несколько секунд.")
+            return None
+
+        key = (user.id, event.text)
+        if key in self._in_flight:
+            THROTTLED.inc("duplicate")
+            return None
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
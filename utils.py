@@ -0,0 +1,60 @@
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from config import TIMEZONE, NOTIFY_HOUR
+
+_tz = ZoneInfo(TIMEZONE) if TIMEZONE else None
+
+
+def parse_birthdate(birthdate: str) -> date:
+    """Разбирает дату рождения в формате DD.MM.YYYY или YYYY-MM-DD."""
+    try:
+        return datetime.strptime(birthdate, "%d.%m.%Y").date()
+    except ValueError:
+        return datetime.strptime(birthdate, "%Y-%m-%d").date()
+
+
+def now() -> datetime:
+    """Текущее время в часовом поясе уведомлений."""
+    return datetime.now(_tz)
+
+
+def format_birthdate(birth_ordinal: int) -> str:
+    """Дата рождения в формате DD.MM.YYYY для показа пользователю."""
+    return date.fromordinal(birth_ordinal).strftime("%d.%m.%Y")
+
+
+def anniversary(birth: datetime, years: int) -> datetime:
+    """Дата, когда исполнится years лет; у родившихся 29 февраля в невисокосный год — 28 февраля."""
+    try:
+        return birth.replace(year=birth.year + years)
+    except ValueError:
+        return birth.replace(year=birth.year + years, day=28)
+
+
+def get_weeks_lived(birth_ordinal: int, today: date = None) -> int:
+    """Число полностью прожитых недель."""
+    return ((today or now().date()).toordinal() - birth_ordinal) // 7
+
+
+def seconds_to_next_week(birth_ordinal: int, moment: datetime = None) -> float:
+    """Сколько секунд осталось до начала следующей недели жизни (полночь дня недели рождения)."""
+    moment = moment or now()
+    weeks = get_weeks_lived(birth_ordinal, moment.date())
+    start = datetime.combine(date.fromordinal(birth_ordinal + 7 * (weeks + 1)), time(), tzinfo=moment.tzinfo)
+    return (start - moment).total_seconds()
+
+
+def next_notify_at(birth_ordinal: int, after: datetime = None) -> int:
+    """
+    Возвращает unix-время ближайшего уведомления пользователя.
+
+    Новая неделя жизни начинается в тот же день недели, в который человек родился,
+    поэтому уведомление приходит в NOTIFY_HOUR этого дня.
+    """
+    after = after or now()
+    day = after.date()
+    day += timedelta(days=(birth_ordinal - day.toordinal()) % 7)
+    moment = datetime.combine(day, time(NOTIFY_HOUR), tzinfo=after.tzinfo)
+    if moment <= after:
+        moment += timedelta(days=7)
+    return int(moment.timestamp())
@@ -0,0 +1,115 @@
+"""
+Приём обновлений через вебхук (aiohttp) вместо long polling.
+
+Telegram присылает обновления POST-запросами; сервер сразу кладёт их в ограниченную очередь
+и отвечает 200, а WEBHOOK_WORKERS задач обрабатывают очереди через тот же Dispatcher,
+что и при polling, поэтому обработчики менять не нужно. У каждой задачи своя очередь,
+и обновления одного пользователя всегда попадают в одну и ту же, чтобы шаги регистрации
+не обгоняли друг друга. Если очередь заполнена дольше WEBHOOK_ENQUEUE_TIMEOUT секунд,
+сервер отвечает 503 и Telegram повторит доставку позже.
+
+Проверить локально можно, отправив записанное обновление:
+    RUN_MODE=webhook python bot.py
+    curl -X POST -H "Content-Type: application/json" -d @update.json http://127.0.0.1:8080/webhook
+"""
+import asyncio
+import hmac
+import logging
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+import metrics
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_ENQUEUE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(self, dp: Dispatcher, bot: Bot, *, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                 workers: int = WEBHOOK_WORKERS, queue_size: int = WEBHOOK_QUEUE_SIZE,
+                 enqueue_timeout: float = WEBHOOK_ENQUEUE_TIMEOUT):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.enqueue_timeout = enqueue_timeout
+        self.queues = [asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self._tasks = []
+        self._runner = None
+        metrics.gauge(
+            "bot_webhook_queue_depth", "Обновлений в очереди вебхука", lambda: sum(q.qsize() for q in self.queues)
+        )
+
+    async def handle(self, request: web.Request) -> web.Response:
+        # Сравнение за постоянное время, чтобы секрет нельзя было подобрать по времени ответа;
+        # байты, а не строки: compare_digest не принимает строки с не-ASCII символами
+        secret = request.headers.get(SECRET_HEADER, "")
+        if self.secret and not hmac.compare_digest(secret.encode(), self.secret.encode()):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Некорректное обновление во вебхуке: {e}")
+            return web.Response(status=400)
+        user = getattr(update.event, "from_user", None)
+        queue = self.queues[(user.id if user else update.update_id) % len(self.queues)]
+        try:
+            await asyncio.wait_for(queue.put(update), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            # Очередь переполнена: пусть Telegram повторит позже
+            logger.warning("Очередь обновлений переполнена, отвечаем 503.")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновления {update.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT):
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Вебхук слушает {host}:{port}{self.path}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()  # Больше не принимаем новые обновления
+            self._runner = None
+        for queue in self.queues:
+            await queue.join()  # Дорабатываем уже принятые
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запускает сервер вебхука и работает до отмены."""
+    server = WebhookServer(dp, bot)
+    await server.start()
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()